@@ -0,0 +1,245 @@
+"""
+Microbenchmarks for the engine's hot paths
+
+Times the GameState queries bots call every turn, Map.explore and
+Replay.write_json on every map with a configurable number of robots, and
+writes the timings as JSON so runs on different branches can be compared.
+
+Run from the repository root:
+    python -m benchmarks.bench_engine -r 20 200 -o bench_engine.json
+    python -m benchmarks.bench_engine -c bench_engine.json
+"""
+import argparse
+from src.game import suppress_stdout
+from src.game_state import GameState
+from src.game_constants import GameConstants, RobotType, Team, TileState
+from src.replay import Replay
+from src.robot import Miner_Robot, Explorer_Robot, Terraformer_Robot
+from src.map import Map
+from pathlib import Path
+import statistics
+import platform
+import random
+import json
+import time
+import sys
+
+ROBOT_CLASSES = {
+    RobotType.MINER: (Miner_Robot, GameConstants.MINER_ACTION_COST),
+    RobotType.EXPLORER: (Explorer_Robot, GameConstants.EXPLORER_ACTION_COST),
+    RobotType.TERRAFORMER: (Terraformer_Robot, GameConstants.TERRAFORMER_ACTION_COST),
+}
+
+
+def measure(func, setup=None, number: int = 200) -> dict:
+    """
+    Calls func number times and returns per-call timings in microseconds
+
+    setup runs before every call, outside the timed region, and its result
+    is passed to func
+    """
+    times = []
+    for _ in range(number):
+        arg = setup() if setup is not None else None
+        startTime = time.perf_counter()
+        func(arg)
+        times.append(time.perf_counter() - startTime)
+    times = [t * 1e6 for t in times]
+    return {
+        "calls": number,
+        "min_us": min(times),
+        "median_us": statistics.median(times),
+        "mean_us": statistics.fmean(times),
+    }
+
+
+def reveal(map: Map):
+    """
+    Explores outwards from every visible tile until nothing new shows up,
+    giving the fog of war of a late game
+    """
+    height, width = map.get_height(), map.get_width()
+    for team in Team:
+        frontier = [(row, col) for row in range(height) for col in range(width)
+            if map.get_tile_state(row, col, team) not in (TileState.ILLEGAL, TileState.IMPASSABLE)]
+        while frontier:
+            newFrontier = []
+            for row, col in frontier:
+                for newRow, newCol in map.explore(row, col, team):
+                    if map.get_tile_state(newRow, newCol, team) != TileState.IMPASSABLE:
+                        newFrontier.append((newRow, newCol))
+            frontier = newFrontier
+
+
+def build_state(map_path: str, num_robots: int, seed: int) -> tuple[GameState, dict]:
+    """
+    Game state on the map with num_robots robots split between both teams,
+    placed at random on tiles their team can see
+    """
+    rng = random.Random(seed)
+    with suppress_stdout():
+        map = Map(map_path, radius=GameConstants.BASE_VISIBLE_RADIUS)
+    fresh = map.fork()
+    reveal(map)
+
+    # Place Robots
+    height, width = map.get_height(), map.get_width()
+    tiles = [(row, col) for row in range(height) for col in range(width)
+        if map.get_tile_state(row, col, Team.RED) not in (TileState.ILLEGAL, TileState.IMPASSABLE)
+        and map.get_tile_state(row, col, Team.BLUE) not in (TileState.ILLEGAL, TileState.IMPASSABLE)]
+    rng.shuffle(tiles)
+    robots = {Team.RED: {}, Team.BLUE: {}}
+    for number, (row, col) in enumerate(tiles[:num_robots], 1):
+        team = Team.RED if number % 2 else Team.BLUE
+        robotClass, actionCost = ROBOT_CLASSES[rng.choice(list(RobotType))]
+        robot = robotClass(row, col, team, height, width, actionCost, f"robot_{number}")
+        robot.reset_acted_status()
+        robot.reset_move_status()
+        robots[team][robot.get_name()] = robot
+
+    info = {
+        "team": Team.BLUE,
+        "red_metal": GameConstants.INIT_METAL,
+        "blue_metal": GameConstants.INIT_METAL,
+        "red_time": GameConstants.TIME_LIMIT,
+        "blue_time": GameConstants.TIME_LIMIT,
+        "turn": 1,
+        "robot_counter": num_robots + 1,
+    }
+    replay = Replay("bench", Path(map_path).stem, height, width, "red", "blue", GameConstants.INIT_METAL,
+        map.initial_map_passability, map.initial_map_metal, map.initial_map_terraformed, map.initial_map_visible)
+    state = GameState(info, robots[Team.RED], robots[Team.BLUE], replay, map)
+    extras = {"info": info, "map": map, "fresh_map": fresh, "occupied": tiles[:num_robots],
+        "robots": robots, "replay": replay, "rng": rng}
+    return state, extras
+
+
+def fill_replay(replay: Replay, robots: dict, num_turns: int):
+    """
+    Records num_turns turns in which every robot moves and terraforms
+    """
+    for turn in range(num_turns):
+        team = Team.BLUE if turn % 2 == 0 else Team.RED
+        teamRobots = list(robots[team].values())
+        for robot in teamRobots:
+            replay.add_robot_changes(robot, False)
+        replay.add_terraformed_tiles([robot.get_coord() for robot in teamRobots])
+        replay.addTurn(team.name.lower(), GameConstants.TIME_LIMIT, len(teamRobots), turn // 2 + 1,
+            GameConstants.INIT_METAL)
+
+
+def bench_map(map_path: str, num_robots: int, number: int, seed: int) -> list[dict]:
+    """
+    Runs every benchmark on one map and robot count
+    """
+    state, extras = build_state(map_path, num_robots, seed)
+    map, rng = extras["map"], extras["rng"]
+    height, width = map.get_height(), map.get_width()
+    passable = [(row, col) for row in range(height) for col in range(width)
+        if map.get_tile_state(row, col, Team.BLUE) not in (TileState.ILLEGAL, TileState.IMPASSABLE)]
+    allyNames = list(extras["robots"][Team.BLUE])
+
+    def cold_state(_=None):
+        # Same game on a new GameState, so nothing is cached
+        return GameState(extras["info"], extras["robots"][Team.RED], extras["robots"][Team.BLUE],
+            extras["replay"], map)
+
+    def random_pair(_=None):
+        return rng.choice(passable), rng.choice(passable)
+
+    def loaded_info(s: GameState):
+        info = s.get_info()
+        return info.map, info.ally_robots, info.enemy_robots
+
+    def explore_setup():
+        freshMap = extras["fresh_map"].fork()
+        team = rng.choice(list(Team))
+        visible = [(row, col) for row in range(height) for col in range(width)
+            if freshMap.get_tile_state(row, col, team) not in (TileState.ILLEGAL, TileState.IMPASSABLE)]
+        return freshMap, team, rng.choice(visible)
+
+    benches = {
+        "get_map": (lambda s: s.get_map(), cold_state),
+        "get_map_cached": (lambda s: state.get_map(), None),
+        "get_info": (lambda s: s.get_info(), cold_state),
+        "get_info_loaded": (loaded_info, cold_state),
+        "get_ally_robots": (lambda s: s.get_ally_robots(), cold_state),
+        "get_enemy_robots": (lambda s: s.get_enemy_robots(), cold_state),
+        "check_for_collision": (lambda coord: state.check_for_collision(*coord),
+            lambda: rng.choice(extras["occupied"]) if extras["occupied"] and rng.random() < 0.5 else rng.choice(passable)),
+        "optimal_path": (lambda pair: state.optimal_path(*pair[0], *pair[1]), random_pair),
+        "robot_to_base": (lambda arg: arg[0].robot_to_base(arg[1]),
+            lambda: (cold_state(), rng.choice(allyNames)) if allyNames else (cold_state(), None)),
+        "robot_to_base_cached": (lambda name: state.robot_to_base(name),
+            lambda: rng.choice(allyNames) if allyNames else None),
+        "map_explore": (lambda arg: arg[0].explore(*arg[2], arg[1]), explore_setup),
+    }
+
+    results = []
+    for name, (func, setup) in benches.items():
+        result = measure(func, setup, number)
+        results.append({"map": Path(map_path).stem, "size": f"{height}x{width}", "robots": num_robots,
+            "bench": name, **result})
+
+    # Replay of a full game
+    fill_replay(extras["replay"], extras["robots"], 2 * GameConstants.NUM_TURNS)
+    result = measure(lambda _: extras["replay"].write_json(True), None, max(number // 20, 3))
+    results.append({"map": Path(map_path).stem, "size": f"{height}x{width}", "robots": num_robots,
+        "bench": "replay_write_json", **result})
+    return results
+
+
+def compare(baseline: dict, current: dict):
+    """
+    Prints the median of every benchmark against a previous run
+    """
+    base = {(r["map"], r["robots"], r["bench"]): r["median_us"] for r in baseline["results"]}
+    print(f"{'map':<16}{'robots':>7}  {'bench':<22}{'base us':>12}{'now us':>12}{'ratio':>8}")
+    for r in current["results"]:
+        key = (r["map"], r["robots"], r["bench"])
+        if key in base:
+            ratio = r["median_us"] / base[key] if base[key] else float("inf")
+            print(f"{r['map']:<16}{r['robots']:>7}  {r['bench']:<22}{base[key]:>12.1f}{r['median_us']:>12.1f}{ratio:>8.2f}")
+
+
+def main():
+    # Parser Arguements
+    parser = argparse.ArgumentParser(description='Engine Microbenchmarks')
+    parser.add_argument("-m", "--maps", nargs="+", help="map names (default: every map in maps/)")
+    parser.add_argument("-r", "--robots", nargs="+", type=int, default=[20, 200], help="robot counts to test")
+    parser.add_argument("-n", "--number", type=int, default=200, help="calls per benchmark")
+    parser.add_argument("-s", "--seed", type=int, default=0, help="seed for robot placement and queries")
+    parser.add_argument("-o", "--output", help="file to write the JSON results to (default: stdout)")
+    parser.add_argument("-c", "--compare", help="previous results file to compare against")
+    currNamespace = parser.parse_args()
+
+    # Collect Maps
+    maps = currNamespace.maps or sorted(p.stem for p in Path("maps").glob("*.awap23m"))
+
+    # Run Benchmarks
+    results = []
+    for map_name in maps:
+        for num_robots in currNamespace.robots:
+            print(f"Benchmarking {map_name} with {num_robots} robots", file=sys.stderr)
+            results.extend(bench_map(f"maps/{map_name}.awap23m", num_robots, currNamespace.number, currNamespace.seed))
+    output = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results,
+    }
+
+    # Save Results
+    retJson = json.dumps(output, indent=2)
+    if currNamespace.output:
+        with open(currNamespace.output, "w") as outfile:
+            outfile.write(retJson)
+    else:
+        print(retJson)
+    if currNamespace.compare:
+        with open(currNamespace.compare) as infile:
+            compare(json.load(infile), output)
+
+
+if __name__ == "__main__":
+    main()
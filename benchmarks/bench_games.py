@@ -0,0 +1,149 @@
+"""
+Full-game throughput benchmark
+
+Plays complete games through Game.run_game, one process per game, and
+reports games per second, how the time splits between the engine and the
+bots, and the peak memory of each game. Throughput is checked against a
+stored baseline and the run fails when it drops by more than the threshold.
+
+Run from the repository root:
+    python -m benchmarks.bench_games --save_baseline
+    python -m benchmarks.bench_games -t 0.1
+"""
+import argparse
+from src.game import Game, suppress_stdout
+from src.game_constants import GameConstants
+from src.replay import Replay, NullReplay
+from multiprocessing import Pool
+from pathlib import Path
+import platform
+import resource
+import json
+import time
+import sys
+
+DEFAULT_BASELINE = "benchmarks/games_baseline.json"
+
+
+def play_game(game: tuple[str, str, str, int, bool]) -> dict:
+    """
+    Plays one game and returns its timings
+
+    Args:
+        game: (map name, red bot name, blue bot name, seed, keep replay)
+    """
+    map_name, red_bot, blue_bot, seed, keep_replay = game
+    replay_type = Replay if keep_replay else NullReplay
+
+    with suppress_stdout():
+        startTime = time.perf_counter()
+        curr = Game(f"{blue_bot}-{red_bot}-{map_name}", f"bots/{red_bot}.py", f"bots/{blue_bot}.py",
+            f"maps/{map_name}.awap23m", print_reply=True, replay_type=replay_type, seed=seed)
+        curr.run_game()
+        wallTime = time.perf_counter() - startTime
+
+    # Time the bots used is what came off their clocks, which includes the
+    # GameState queries they make; engine time is the turn bookkeeping around it
+    botTime = 2 * GameConstants.TIME_LIMIT - curr.info.get("red_time") - curr.info.get("blue_time")
+    return {
+        "map": map_name,
+        "red_bot": red_bot,
+        "blue_bot": blue_bot,
+        "winner": curr.replay.metadata.winner,
+        "wall_time": wallTime,
+        "bot_time": botTime,
+        "engine_time": wallTime - botTime,
+        # ru_maxrss is in kilobytes on Linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def run_games(games: list[tuple]) -> tuple[list[dict], float]:
+    """
+    Plays the games one after another, each in a new process so memory and
+    module state don't carry over
+    """
+    results = []
+    startTime = time.perf_counter()
+    with Pool(processes=1, maxtasksperchild=1) as pool:
+        for result in pool.imap(play_game, games):
+            results.append(result)
+            print(f"{result['red_bot']} (red) vs {result['blue_bot']} (blue) on {result['map']}: "
+                f"{result['wall_time']:.1f}s, engine {result['engine_time']:.1f}s, "
+                f"{result['peak_rss_mb']:.0f} MB", file=sys.stderr)
+    return results, time.perf_counter() - startTime
+
+
+def summarize(games: list[tuple], results: list[dict], elapsed: float) -> dict:
+    totalWall = sum(r["wall_time"] for r in results)
+    totalBot = sum(r["bot_time"] for r in results)
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "games": [list(game[:4]) for game in games],
+        "elapsed": elapsed,
+        "games_per_second": len(results) / elapsed,
+        "engine_games_per_second": len(results) / (totalWall - totalBot),
+        "bot_time": totalBot,
+        "engine_time": totalWall - totalBot,
+        "peak_rss_mb": max(r["peak_rss_mb"] for r in results),
+        "results": results,
+    }
+
+
+def main():
+    # Parser Arguements
+    parser = argparse.ArgumentParser(description='Full Game Benchmark')
+    parser.add_argument("-r", "--red_bot", default="final_submission", help="red bot name")
+    parser.add_argument("-b", "--blue_bot", default="second_bot", help="blue bot name")
+    parser.add_argument("-m", "--maps", nargs="+", help="map names (default: every map in maps/)")
+    parser.add_argument("-s", "--seed", type=int, default=0, help="seed for every game")
+    parser.add_argument("-kr", "--keep_replay", action="store_true", help="record full replays (not written to disk)")
+    parser.add_argument("-o", "--output", help="file to write the JSON results to")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline results file")
+    parser.add_argument("--save_baseline", action="store_true", help="store this run as the baseline")
+    parser.add_argument("-t", "--threshold", type=float, default=0.1,
+        help="fail when games per second drop by more than this fraction of the baseline")
+    currNamespace = parser.parse_args()
+
+    # Collect Games
+    maps = currNamespace.maps or sorted(p.stem for p in Path("maps").glob("*.awap23m"))
+    games = [(map_name, currNamespace.red_bot, currNamespace.blue_bot, currNamespace.seed, currNamespace.keep_replay)
+        for map_name in maps]
+
+    # Play Games
+    results, elapsed = run_games(games)
+    summary = summarize(games, results, elapsed)
+    print(f"{len(results)} games in {elapsed:.1f}s: {summary['games_per_second']:.4f} games/s, "
+        f"engine {summary['engine_time']:.1f}s, bots {summary['bot_time']:.1f}s, "
+        f"peak {summary['peak_rss_mb']:.0f} MB")
+    if currNamespace.output:
+        with open(currNamespace.output, "w") as outfile:
+            json.dump(summary, outfile, indent=2)
+
+    # Store Baseline
+    if currNamespace.save_baseline:
+        with open(currNamespace.baseline, "w") as outfile:
+            json.dump(summary, outfile, indent=2)
+        print(f"Baseline saved to {currNamespace.baseline}")
+        return
+
+    # Check Baseline
+    if not Path(currNamespace.baseline).exists():
+        print(f"No baseline at {currNamespace.baseline}, run with --save_baseline to create one")
+        return
+    with open(currNamespace.baseline) as infile:
+        baseline = json.load(infile)
+    if baseline["games"] != summary["games"]:
+        print("Baseline was recorded on different games, not comparing")
+        return
+    ratio = summary["games_per_second"] / baseline["games_per_second"]
+    print(f"Throughput is {ratio:.2f}x the baseline ({baseline['games_per_second']:.4f} games/s)")
+    if ratio < 1 - currNamespace.threshold:
+        print(f"Regression: throughput dropped by more than {currNamespace.threshold:.0%}")
+        exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,7 +4,9 @@ and running the match.
 """
 import argparse
 from src.game import Game
+from src.replay import Replay, StreamingReplay, NullReplay
 from src.map_validate import val_maps
+from src.map_binary import convert_maps, map_path
 from os import path
 import json
 from src.errors import *
@@ -21,6 +23,14 @@ def main():
     parser.add_argument('-sr', '--silence_red', action='store_true', help="silence red bot verbose")
     parser.add_argument('-f', '--file_input', help="read game settings (map, blueBot, redBot) from specified file")
     parser.add_argument('-vm', '--validate_map', action='store_true', help="runs map validator only")
+    parser.add_argument('-cm', '--convert_maps', action='store_true', help="validates every map and converts it to the binary format")
+    parser.add_argument('-i', '--isolate', action='store_true', help="run each bot in its own process")
+    parser.add_argument('-st', '--stream_replay', action='store_true', help="write the replay turn by turn as JSON lines")
+    parser.add_argument('-ct', '--cpu_time', action='store_true', help="charge bots for CPU time instead of wall clock time")
+    parser.add_argument('-or', '--output_replay', action='store_true', help="save the end of each bot's output in the replay")
+    parser.add_argument('-ol', '--output_log', help="append the end of each bot's output to this file")
+    parser.add_argument('-s', '--seed', type=int, help="seed for random maps and the bots' random module")
+    parser.add_argument('-nr', '--no_replay', action='store_true', help="headless mode, keep only the winner and final scores")
 
     # Define Input through CLI
     currNamespace = parser.parse_args()
@@ -29,6 +39,10 @@ def main():
         val_maps()
         return
 
+    if currNamespace.convert_maps:
+        convert_maps()
+        return
+
     
     if currNamespace.file_input is not None:
         # read map, blueBot,redBot from file
@@ -46,8 +60,8 @@ def main():
             exit(1)
 
 
-    # Check Map File
-    mapFile = f"maps/{currNamespace.map}.awap23m"
+    # Check Map File, the binary version loads faster when there is one
+    mapFile = map_path(currNamespace.map)
 
     # Check Blue Bot File
     blueBotFile = f"bots/{currNamespace.blue_bot}.py"
@@ -63,13 +77,22 @@ def main():
     print_reply = currNamespace.replay_print
     silence_blue = currNamespace.silence_blue
     silence_red = currNamespace.silence_red
+    isolate = currNamespace.isolate
+    if currNamespace.no_replay:
+        replay_type = NullReplay
+    elif currNamespace.stream_replay:
+        replay_type = StreamingReplay
+    else:
+        replay_type = Replay
 
     # Define game name for replay
     gameName = f"{currNamespace.blue_bot}-{currNamespace.red_bot}-{currNamespace.map}"
 
     # Get Game
     curr = Game(gameName, redBotFile, blueBotFile, mapFile, 
-    print_reply=print_reply, silence_blue=silence_blue, silence_red=silence_red)
+    print_reply=print_reply, silence_blue=silence_blue, silence_red=silence_red, isolate=isolate,
+    replay_type=replay_type, seed=currNamespace.seed, cpu_time=currNamespace.cpu_time,
+    output_to_replay=currNamespace.output_replay, output_log=currNamespace.output_log)
     replay = curr.run_game()
     if print_reply: print(replay)
 
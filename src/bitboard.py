@@ -0,0 +1,82 @@
+from functools import lru_cache
+
+"""
+Bitboards over the map
+
+A bitboard is a Python int with bit row*width+col set for every tile in the
+set, so unions, intersections and neighbourhood tests over the whole map are
+a handful of integer operations.
+"""
+
+# Any nonzero byte becomes the digit 1
+_DIGITS = bytes([ord("0")] + [ord("1")] * 255)
+
+
+@lru_cache(maxsize=None)
+def board_masks(height: int, width: int) -> tuple[int, int, int]:
+    """
+    Masks of the whole board, of every column but the first and of every
+    column but the last
+    """
+    full = (1 << (height * width)) - 1
+    firstCol = 0
+    for row in range(height):
+        firstCol |= 1 << (row * width)
+    lastCol = firstCol << (width - 1)
+    return full, full & ~firstCol, full & ~lastCol
+
+
+def dilate(bits: int, height: int, width: int) -> int:
+    """
+    Grows the set by one tile in all eight directions, the 3x3 area an
+    explorer reveals
+    """
+    full, notFirstCol, notLastCol = board_masks(height, width)
+    # Shifting by one moves tiles across the row ends, mask those out
+    rowGrown = bits | ((bits << 1) & notFirstCol) | ((bits >> 1) & notLastCol)
+    return (rowGrown | (rowGrown << width) | (rowGrown >> width)) & full
+
+
+@lru_cache(maxsize=4096)
+def around_mask(row: int, col: int, height: int, width: int) -> int:
+    """
+    Bitboard of the in-bounds 3x3 area centered on (row, col)
+    """
+    colStart, colEnd = max(col - 1, 0), min(col + 2, width)
+    rowBits = ((1 << (colEnd - colStart)) - 1) << colStart
+    mask = 0
+    for newRow in range(max(row - 1, 0), min(row + 2, height)):
+        mask |= rowBits << (newRow * width)
+    return mask
+
+
+def from_layer(layer: bytearray) -> int:
+    """
+    Bitboard of the nonzero entries of a flat byte layer
+    """
+    if not layer:
+        return 0
+    return int(bytes(layer).translate(_DIGITS)[::-1], 2)
+
+
+def to_indices(bits: int) -> list[int]:
+    """
+    Flat indices (row*width+col) of the set bits, in increasing order
+    """
+    # Peeling off the lowest bit is cheaper for a few bits, scanning the
+    # binary string for many
+    if bits.bit_count() > 32:
+        return [idx for idx, digit in enumerate(reversed(bin(bits))) if digit == "1"]
+    indices = []
+    while bits:
+        low = bits & -bits
+        indices.append(low.bit_length() - 1)
+        bits ^= low
+    return indices
+
+
+def to_coords(bits: int, width: int) -> list[tuple[int, int]]:
+    """
+    (row, col) of the set bits, in row-major order
+    """
+    return [divmod(idx, width) for idx in to_indices(bits)]
@@ -0,0 +1,79 @@
+from collections import deque
+import io
+
+"""
+Capture of what the bots print
+"""
+
+
+class BotOutput(io.TextIOBase):
+    """
+    Text stream keeping the last `limit` characters a bot printed
+
+    Stands in for sys.stdout while the bot plays. Writes are appended to a
+    ring of chunks and the oldest chunks are dropped once over the limit,
+    so memory stays bounded however much the bot prints. With echo set,
+    every line is also passed on to that stream prefixed with the bot's tag.
+    """
+
+    def __init__(self, tag: str, limit: int = 64 * 1024, echo=None):
+        self.tag = tag
+        self.limit = limit
+        self.echo = echo
+        self.total = 0
+        self._chunks = deque()
+        self._size = 0
+        self._line_start = True
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        if not text:
+            return 0
+        self.total += len(text)
+
+        # Keep Tail
+        if len(text) >= self.limit:
+            self._chunks.clear()
+            self._chunks.append(text[-self.limit:])
+            self._size = self.limit
+        else:
+            self._chunks.append(text)
+            self._size += len(text)
+            while self._size > self.limit:
+                extra = self._size - self.limit
+                first = self._chunks[0]
+                if len(first) <= extra:
+                    self._chunks.popleft()
+                    self._size -= len(first)
+                else:
+                    self._chunks[0] = first[extra:]
+                    self._size -= extra
+
+        # Echo With Attribution
+        if self.echo is not None:
+            out = []
+            start = 0
+            while start < len(text):
+                end = text.find("\n", start) + 1 or len(text)
+                if self._line_start:
+                    out.append(f"[{self.tag}] ")
+                out.append(text[start:end])
+                self._line_start = text[end - 1] == "\n"
+                start = end
+            self.echo.write("".join(out))
+        return len(text)
+
+    def flush(self):
+        if self.echo is not None:
+            self.echo.flush()
+
+    def getvalue(self) -> str:
+        """
+        The last `limit` characters printed
+        """
+        return "".join(self._chunks)
+
+    def truncated(self) -> bool:
+        return self.total > self._size
@@ -0,0 +1,161 @@
+"""
+Runs a bot in its own process, so a turn that runs out of time can be
+killed instead of being left running next to the engine
+"""
+from src.game_constants import Team, RobotType, Direction, GameConstants
+from src.game_state import GameState
+from src.replay import Replay, NullReplay
+from src.bot_output import BotOutput
+from src.info import RobotInfo
+from src.errors import *
+import multiprocessing
+import traceback
+import random
+import time
+import sys
+import os
+
+
+class RecordingGameState(GameState):
+    """
+    GameState over the worker's copy of the game that logs every successful
+    action, so the engine can replay them on the true game state
+    """
+
+    def __init__(self, info: dict, red_robots: dict, blue_robots: dict, replay: Replay, map):
+        super().__init__(info, red_robots, blue_robots, replay, map)
+        self.actions = []
+
+    def spawn_robot(self, type: RobotType, row: int, col: int) -> RobotInfo:
+        result = super().spawn_robot(type, row, col)
+        self.actions.append(("spawn_robot", (type, row, col)))
+        return result
+
+    def robot_action(self, robotName: str):
+        result = super().robot_action(robotName)
+        self.actions.append(("robot_action", (robotName,)))
+        return result
+
+    def move_robot(self, robotName: str, move: Direction) -> bool:
+        result = super().move_robot(robotName, move)
+        self.actions.append(("move_robot", (robotName, move)))
+        return result
+
+    def transform_robot(self, robotName: str, type: RobotType) -> RobotInfo:
+        result = super().transform_robot(robotName, type)
+        self.actions.append(("transform_robot", (robotName, type)))
+        return result
+
+
+def _worker_main(conn, module_name: str, bot_path: str, team: Team, silence: bool, seed: int, output_limit: int):
+    """
+    Worker loop: receives the game state each turn, runs the bot on a copy
+    of it and sends back the actions it took, how long it ran and what it
+    printed
+    """
+    from src.game import import_file
+    if silence:
+        sys.stdout = open(os.devnull, "w")
+    if seed is not None:
+        random.seed(seed)
+
+    try:
+        player = import_file(module_name, bot_path).BotPlayer(team)
+    except Exception:
+        conn.send(("error", traceback.format_exc()))
+        return
+    conn.send(("ready", None))
+
+    while True:
+        message = conn.recv()
+        if message is None:
+            return
+        info, red_robots, blue_robots, map = message
+
+        # Rebuild the game state, info carries the robot counter so robots
+        # spawned here get the engine's names
+        game_state = RecordingGameState(info, red_robots, blue_robots, NullReplay("", "", 0, 0, "", "", 0), map)
+
+        # Play Turn, a bot error ends the turn like it does in a thread
+        stdout = sys.stdout
+        sys.stdout = output = BotOutput(team.name.lower(), output_limit)
+        funcTime = time.time()
+        cpuTime = time.process_time()
+        try:
+            player.play_turn(game_state)
+        except Exception:
+            traceback.print_exc()
+        cpuTime = time.process_time() - cpuTime
+        funcTime = time.time() - funcTime
+        game_state._expire_infos()
+        sys.stdout = stdout
+        conn.send(("done", (game_state.actions, funcTime, cpuTime, output.getvalue())))
+
+
+class BotProcess:
+    """
+    Persistent worker process holding one bot
+    """
+
+    def __init__(self, module_name: str, bot_path: str, team: Team, silence: bool, seed: int = None,
+        output_limit: int = 64 * 1024):
+        self._conn, child_conn = multiprocessing.Pipe()
+        self._process = multiprocessing.Process(
+            target=_worker_main,
+            args=(child_conn, module_name, bot_path, team, silence, seed, output_limit),
+            name=f"bot_{team.name.lower()}",
+            daemon=True
+        )
+        self._process.start()
+        child_conn.close()
+
+        # Wait for the bot to load, this isn't charged to the bot but is limited
+        try:
+            loaded = self._conn.poll(GameConstants.LOAD_TIME_LIMIT)
+            status, error = self._conn.recv() if loaded else (None, None)
+        except (EOFError, OSError):
+            status, error = "error", "The worker exited while loading the bot"
+        if status is None:
+            self._process.kill()
+            self.close()
+            raise InvalidBotFileError(f"Could not load {bot_path} within {GameConstants.LOAD_TIME_LIMIT}s")
+        if status == "error":
+            self.close()
+            raise InvalidBotFileError(f"Could not load {bot_path}\n{error}")
+
+    def play_turn(self, info: dict, red_robots: dict, blue_robots: dict, map, time_left: float):
+        """
+        Runs one turn in the worker
+
+        Returns the recorded actions, the wall clock and CPU time the bot
+        spent and the output it printed, or None if the bot did not finish within time_left (or its
+        process died), in which case the worker is killed.
+        """
+        try:
+            self._conn.send((info, red_robots, blue_robots, map))
+            if self._conn.poll(time_left):
+                status, result = self._conn.recv()
+                return result
+        except (EOFError, OSError):
+            # The worker died during the turn
+            pass
+        self._process.kill()
+        self.close()
+        return None
+
+    def close(self):
+        """
+        Stops the worker
+        """
+        if self._conn.closed:
+            return
+        if self._process.is_alive():
+            try:
+                self._conn.send(None)
+            except OSError:
+                pass
+            self._process.join(1)
+        if self._process.is_alive():
+            self._process.kill()
+            self._process.join()
+        self._conn.close()
@@ -54,4 +54,7 @@ class InvalidMapError(UserError):
     pass
 
 class UnknownRobotError(UserError):
+    pass
+
+class ExpiredGameInfoError(UserError):
     pass
\ No newline at end of file
@@ -0,0 +1,374 @@
+from src.game_constants import Team, Direction, TileState, GameConstants, RobotType
+from src.info import RobotInfo
+from src.errors import *
+from array import array
+
+"""
+Forward model for lookahead search, see GameState.clone
+
+A ForwardModel is a compact copy of what one team can see: tiles and robots
+are kept in flat arrays indexed by row*width+col and by robot slot, and no
+replay is written, so copying and stepping it is cheap. Actions follow the
+same rules as GameState and raise the same errors.
+"""
+
+ROBOT_TYPES = list(RobotType)
+TILE_STATES = {state.value: state for state in TileState}
+TEAMS = {team.value: team for team in Team}
+ACTION_COSTS = {
+    RobotType.MINER: GameConstants.MINER_ACTION_COST,
+    RobotType.EXPLORER: GameConstants.EXPLORER_ACTION_COST,
+    RobotType.TERRAFORMER: GameConstants.TERRAFORMER_ACTION_COST,
+}
+
+
+class ForwardModel:
+    """
+    Team-perspective copy of the game for simulating moves
+
+    Tiles under fog of war are ILLEGAL, as they are to the bot, and stay that
+    way when explored in the model since their contents are unknown. Only
+    visible enemy robots are included and they never act. end_turn moves on
+    to the team's next turn.
+    """
+    __slots__ = ("_height", "_width", "_team", "_turn", "_metal", "_robot_counter",
+        "_state", "_mining", "_terraform", "_fog", "_terraformed",
+        "_names", "_slots", "_teams", "_types", "_pos", "_battery", "_acted", "_moved", "_occupied")
+
+    def __init__(self, height: int, width: int, team: Team, turn: int, metal: int, robot_counter: int,
+        state: bytearray, mining: array, terraform: array, fog: bytearray, robots: list[RobotInfo]):
+        """
+        Args:
+            state: TileState value of every tile, ILLEGAL under fog of war
+            mining: mining yield of every tile, 0 under fog of war
+            terraform: terraform value of every tile, 0 under fog of war
+            fog: 1 where the tile is hidden from the team
+            robots: ally and visible enemy robots
+        """
+        self._height = height
+        self._width = width
+        self._team = team
+        self._turn = turn
+        self._metal = metal
+        self._robot_counter = robot_counter
+
+        # Tiles
+        self._state = state
+        self._mining = mining
+        self._terraform = terraform
+        self._fog = fog
+        self._terraformed = {
+            Team.RED: sum(1 for value in terraform if value < 0),
+            Team.BLUE: sum(1 for value in terraform if value > 0),
+        }
+
+        # Robots, one slot each, a removed robot's slot stays unused
+        self._names = []
+        self._slots = {}
+        self._teams = bytearray()
+        self._types = bytearray()
+        self._pos = array('i')
+        self._battery = array('i')
+        self._acted = bytearray()
+        self._moved = bytearray()
+        self._occupied = array('i', [-1]) * (height * width)
+        for robot in robots:
+            self.__add_robot(robot.name, robot.team, robot.type, robot.row * width + robot.col,
+                robot.battery, robot.acted, robot.moved)
+
+    def clone(self) -> "ForwardModel":
+        """
+        Independent copy of this model, tile states and mining yields never
+        change so they are shared
+        """
+        other = ForwardModel.__new__(ForwardModel)
+        other._height = self._height
+        other._width = self._width
+        other._team = self._team
+        other._turn = self._turn
+        other._metal = self._metal
+        other._robot_counter = self._robot_counter
+        other._state = self._state
+        other._mining = self._mining
+        other._terraform = self._terraform[:]
+        other._fog = self._fog[:]
+        other._terraformed = dict(self._terraformed)
+        other._names = self._names[:]
+        other._slots = dict(self._slots)
+        other._teams = self._teams[:]
+        other._types = self._types[:]
+        other._pos = self._pos[:]
+        other._battery = self._battery[:]
+        other._acted = self._acted[:]
+        other._moved = self._moved[:]
+        other._occupied = self._occupied[:]
+        return other
+
+    def __add_robot(self, name: str, team: Team, type: RobotType, idx: int, battery: int, acted: bool, moved: bool):
+        slot = len(self._names)
+        self._names.append(name)
+        self._slots[name] = slot
+        self._teams.append(team.value)
+        self._types.append(ROBOT_TYPES.index(type))
+        self._pos.append(idx)
+        self._battery.append(battery)
+        self._acted.append(acted)
+        self._moved.append(moved)
+        self._occupied[idx] = slot
+        return slot
+
+    def __remove_robot(self, slot: int):
+        self._slots.pop(self._names[slot])
+        self._occupied[self._pos[slot]] = -1
+
+    def __robot_info(self, slot: int) -> RobotInfo:
+        row, col = divmod(self._pos[slot], self._width)
+        type = ROBOT_TYPES[self._types[slot]]
+        return RobotInfo(self._battery[slot], bool(self._acted[slot]), bool(self._moved[slot]),
+            ACTION_COSTS[type], row, col, TEAMS[self._teams[slot]], self._names[slot], type)
+
+    def __ally_slot(self, robotName: str) -> int:
+        slot = self._slots.get(robotName)
+        if slot is None or self._teams[slot] != self._team.value:
+            return None
+        return slot
+
+    def __tile_state(self, row: int, col: int) -> TileState:
+        if (row < 0 or row >= self._height or col < 0 or col >= self._width):
+            return TileState.ILLEGAL
+        return TILE_STATES[self._state[row * self._width + col]]
+
+    def __is_ally_terraformed(self, idx: int) -> bool:
+        if self._team == Team.RED:
+            return self._terraform[idx] < 0
+        return self._terraform[idx] > 0
+
+    """ ACTIONS """
+
+    def __assert_can_move_robot(self, robotName: str, move: Direction):
+        if move is None:
+            raise IllegalMoveError(f"Move must be in a valid direction, received:{move}")
+        slot = self.__ally_slot(robotName)
+        if slot is None:
+            raise IllegalMoveError(f"Unknown robot {robotName}")
+        row, col = divmod(self._pos[slot], self._width)
+        tile_state = self.__tile_state(row + move.value[0], col + move.value[1])
+        if tile_state == TileState.ILLEGAL:
+            raise IllegalMoveError("Attempting to move into illegal tile")
+        if tile_state == TileState.IMPASSABLE:
+            raise IllegalMoveError("Attempting to move into impassable tile")
+
+    def can_move_robot(self, robotName: str, move: Direction) -> bool:
+        try:
+            self.__assert_can_move_robot(robotName, move)
+        except IllegalMoveError:
+            return False
+        return True
+
+    def move_robot(self, robotName: str, move: Direction) -> bool:
+        self.__assert_can_move_robot(robotName, move)
+        slot = self._slots[robotName]
+        row, col = divmod(self._pos[slot], self._width)
+        newIdx = (row + move.value[0]) * self._width + col + move.value[1]
+
+        # Moving onto any robot destroys both, even after moving this turn
+        other = self._occupied[newIdx]
+        if other != -1:
+            self.__remove_robot(slot)
+            self.__remove_robot(other)
+            return True
+
+        # Preform Move
+        if self._moved[slot]:
+            return False
+        self._moved[slot] = True
+        self._occupied[self._pos[slot]] = -1
+        self._occupied[newIdx] = slot
+        self._pos[slot] = newIdx
+        return True
+
+    def __assert_can_robot_action(self, robotName: str):
+        slot = self.__ally_slot(robotName)
+        if slot is None:
+            raise IllegalActionError(f"Unknown robot {robotName}")
+        type = ROBOT_TYPES[self._types[slot]]
+        idx = self._pos[slot]
+        row, col = divmod(idx, self._width)
+
+        # Ready to act
+        if self._acted[slot]:
+            raise IllegalActionError(f"{robotName} {row, col} has already acted")
+        if self._battery[slot] < ACTION_COSTS[type]:
+            raise IllegalActionError(f"{robotName} {row, col} has {self._battery[slot]}, needs {ACTION_COSTS[type]} battery")
+
+        # Tile allows the action
+        tile_state = TILE_STATES[self._state[idx]]
+        if type == RobotType.MINER:
+            if tile_state != TileState.MINING:
+                raise IllegalActionError("Tried to mine on non-mining tile")
+        elif type == RobotType.TERRAFORMER:
+            if tile_state != TileState.TERRAFORMABLE:
+                raise IllegalActionError(f"Tried to terraform a non-terraformable tile at {row, col}")
+            new_val = self._terraform[idx] + (1 if self._team == Team.BLUE else -1)
+            if not (-GameConstants.TERRAFORM_MAX <= new_val <= GameConstants.TERRAFORM_MAX):
+                raise IllegalActionError(f"Tried to terraform a tile that has max terraform at {row, col}")
+        elif not any(self._fog[nidx] for nidx in self.__around(idx)):
+            raise IllegalActionError(f"Tried to explore, but no nearby tiles have fog at {row, col}")
+
+    def __around(self, idx: int) -> list[int]:
+        # The tile and its in-bounds neighbors
+        row, col = divmod(idx, self._width)
+        return [newRow * self._width + newCol
+            for newRow in range(max(row - 1, 0), min(row + 2, self._height))
+            for newCol in range(max(col - 1, 0), min(col + 2, self._width))]
+
+    def can_robot_action(self, robotName: str) -> bool:
+        try:
+            self.__assert_can_robot_action(robotName)
+        except IllegalActionError:
+            return False
+        return True
+
+    def robot_action(self, robotName: str):
+        self.__assert_can_robot_action(robotName)
+        slot = self._slots[robotName]
+        type = ROBOT_TYPES[self._types[slot]]
+        idx = self._pos[slot]
+        self._acted[slot] = True
+        self._battery[slot] -= ACTION_COSTS[type]
+
+        if type == RobotType.MINER:
+            self._metal += self._mining[idx]
+        elif type == RobotType.TERRAFORMER:
+            old = self._terraform[idx]
+            new = old + (1 if self._team == Team.BLUE else -1)
+            self._terraform[idx] = new
+            if (old > 0) != (new > 0):
+                self._terraformed[Team.BLUE] += 1 if new > 0 else -1
+            if (old < 0) != (new < 0):
+                self._terraformed[Team.RED] += 1 if new < 0 else -1
+        else:
+            for nidx in self.__around(idx):
+                self._fog[nidx] = 0
+
+    def __assert_can_spawn_robot(self, type: RobotType, row: int, col: int):
+        if (type == None):
+            raise IllegalSpawnError(f"Invalid robot type {type}")
+        spawnTile = self.__tile_state(row, col)
+        if (spawnTile == TileState.ILLEGAL or spawnTile == TileState.IMPASSABLE):
+            raise IllegalSpawnError(f"Tried to spawn on illegal tile, type:{spawnTile} at {row, col}")
+        idx = row * self._width + col
+        if not self.__is_ally_terraformed(idx):
+            raise IllegalSpawnError(f"Tried to spawn on tile that isn't ally terraformed, status:{self._terraform[idx]} at {row, col}")
+        if self._occupied[idx] != -1:
+            raise IllegalSpawnError(f"Tried to spawn on occupied tile at {row, col}")
+        if self._metal < GameConstants.ROBOT_SPAWN_COST:
+            raise IllegalSpawnError(f"Not enough metal to spawn, has: {self._metal}, needs: {GameConstants.ROBOT_SPAWN_COST}")
+
+    def can_spawn_robot(self, type: RobotType, row: int, col: int) -> bool:
+        try:
+            self.__assert_can_spawn_robot(type, row, col)
+        except IllegalSpawnError:
+            return False
+        return True
+
+    def spawn_robot(self, type: RobotType, row: int, col: int) -> RobotInfo:
+        self.__assert_can_spawn_robot(type, row, col)
+        self._metal -= GameConstants.ROBOT_SPAWN_COST
+        slot = self.__add_robot(self.__new_robot_name(), self._team, type, row * self._width + col,
+            GameConstants.INIT_BATTERY, True, True)
+        return self.__robot_info(slot)
+
+    def __assert_can_transform_robot(self, robotName: str, type: RobotType):
+        if (type == None):
+            raise IllegalTransformError(f"Invalid robot type {type}")
+        if self.__ally_slot(robotName) is None:
+            raise IllegalTransformError(f"Unknown robot {robotName}")
+        if self._metal < GameConstants.ROBOT_TRANSFORM_COST:
+            raise IllegalTransformError(f"Not enough metal to transform, has: {self._metal}, needs: {GameConstants.ROBOT_TRANSFORM_COST}")
+
+    def can_transform_robot(self, robotName: str, type: RobotType) -> bool:
+        try:
+            self.__assert_can_transform_robot(robotName, type)
+        except IllegalTransformError:
+            return False
+        return True
+
+    def transform_robot(self, robotName: str, type: RobotType) -> RobotInfo:
+        self.__assert_can_transform_robot(robotName, type)
+        slot = self._slots[robotName]
+
+        # The game charges the spawn cost for a transform
+        self._metal -= GameConstants.ROBOT_SPAWN_COST
+
+        # Replaced by a new robot with the same battery
+        self.__remove_robot(slot)
+        newSlot = self.__add_robot(self.__new_robot_name(), self._team, type, self._pos[slot],
+            self._battery[slot], True, True)
+        return self.__robot_info(newSlot)
+
+    def __new_robot_name(self) -> str:
+        counter = self._robot_counter
+        self._robot_counter += 1
+        return f"robot_{counter}"
+
+    def end_turn(self):
+        """
+        Moves on to the team's next turn: passive metal, and ally robots are
+        reset and charged on ally terraformed tiles. The enemy doesn't act.
+        """
+        self._turn += 1
+        self._metal += GameConstants.METAL_GAINED_PER_TURN
+        team = self._team.value
+        for slot in self._slots.values():
+            if self._teams[slot] != team:
+                continue
+            self._acted[slot] = False
+            self._moved[slot] = False
+            if self.__is_ally_terraformed(self._pos[slot]):
+                self._battery[slot] = min(self._battery[slot] + GameConstants.ROBOT_CHARGE, GameConstants.INIT_BATTERY)
+
+    """ GETTERS """
+
+    def get_ally_robots(self) -> dict[str, RobotInfo]:
+        team = self._team.value
+        return {name: self.__robot_info(slot) for name, slot in self._slots.items() if self._teams[slot] == team}
+
+    def get_enemy_robots(self) -> dict[str, RobotInfo]:
+        team = self._team.value
+        return {name: self.__robot_info(slot) for name, slot in self._slots.items() if self._teams[slot] != team}
+
+    def get_robot_at(self, row: int, col: int) -> RobotInfo:
+        if self.__tile_state(row, col) == TileState.ILLEGAL:
+            return None
+        slot = self._occupied[row * self._width + col]
+        return None if slot == -1 else self.__robot_info(slot)
+
+    def get_tile_state(self, row: int, col: int) -> TileState:
+        return self.__tile_state(row, col)
+
+    def get_terraform(self, row: int, col: int) -> int:
+        """
+        Terraform value as the team sees it in TileInfo, positive for ally
+        """
+        terraform = self._terraform[row * self._width + col]
+        return -terraform if self._team == Team.RED else terraform
+
+    def get_mining(self, row: int, col: int) -> int:
+        return self._mining[row * self._width + col]
+
+    def get_terraformed_count(self, team: Team) -> int:
+        """
+        Number of tiles known to be terraformed by the team
+        """
+        return self._terraformed[team]
+
+    def get_metal(self) -> int:
+        return self._metal
+
+    def get_team(self) -> Team:
+        return self._team
+
+    def get_turn(self) -> int:
+        return self._turn
+
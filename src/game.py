@@ -6,14 +6,18 @@ from src.game_constants import Team
 from src.game_state import GameState
 from src.replay import Replay
 from src.robot import Robot
-from src.map import Map
+from src.map import load_map
 from src.game_constants import GameConstants
+from src.bot_process import BotProcess
+from src.bot_output import BotOutput
 import importlib.util
 import sys
 from contextlib import contextmanager
 import os
 from threading import Thread
 import time
+import traceback
+import random
 
 # Global Functions
 @contextmanager
@@ -26,34 +30,86 @@ def suppress_stdout():
         finally:
             sys.stdout = old_stdout
 
+# Compiled bot files, keyed by (path, mtime, size)
+_code_cache = {}
+
+def compile_file(file_path):
+    stat = os.stat(file_path)
+    key = (os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size)
+    code = _code_cache.get(key)
+    if code is None:
+        with open(file_path, "rb") as f:
+            code = compile(f.read(), file_path, "exec")
+        _code_cache[key] = code
+    return code
+
 def import_file(module_name, file_path):
+    """
+    Loads a bot file into a new module registered in sys.modules as
+    module_name, so two teams playing the same file don't share module globals
+
+    Give each bot its own name, the module stays registered (dataclasses,
+    pickle and the like look it up there) until the caller removes it.
+    """
     spec = importlib.util.spec_from_file_location(module_name, file_path)
     module = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(module)
     sys.modules[module_name] = module
+    try:
+        exec(compile_file(file_path), module.__dict__)
+    except BaseException:
+        sys.modules.pop(module_name, None)
+        raise
     return module
 
+# With CPU time accounting, a turn is still cut off after this many times
+# the bot's remaining time on the wall clock, so a sleeping bot can't hang the game
+CPU_WALL_FACTOR = 2
+
 class Game:
-    def __init__(self, game_name, red_path, blue_path, map_path, print_reply=False, silence_blue=True, silence_red=True):
+    def __init__(self, game_name, red_path, blue_path, map_path, print_reply=False, silence_blue=True, silence_red=True,
+        isolate=False, replay_type=Replay, seed=None, cpu_time=False, output_limit=64 * 1024,
+        output_to_replay=False, output_log=None):
         """
         Initializes players
 
         Args:
             p1_path (_type_): path to player 1's file
             p2_path (_type_): path to player 2's file
+            isolate (bool): run each bot in its own worker process, which is
+                killed when the bot runs out of time
+            replay_type (type): Replay class recording the game, e.g. StreamingReplay
+            seed (int): seeds random map generation and the bots' random module,
+                so the same inputs replay the same game
+            cpu_time (bool): charge bots for the CPU time of their turn instead
+                of the wall clock time
+            output_limit (int): characters of each bot's printed output to keep
+            output_to_replay (bool): store the kept output in the replay
+            output_log (str): file to append the kept output to after the game
         """
 
-        # initialize map
-        self.map = Map(map_path, radius=GameConstants.BASE_VISIBLE_RADIUS)
+        # initialize map, parsed maps are reused across games in this process
+        self.map = load_map(map_path, radius=GameConstants.BASE_VISIBLE_RADIUS, seed=seed)
+        if seed is not None:
+            random.seed(seed)
 
         # General Game Variables
         self.winner = None
+        self.closed = False
         self.max_turns = GameConstants.NUM_TURNS
         self.robot_charge = GameConstants.ROBOT_CHARGE
         self.passive_metal = GameConstants.METAL_GAINED_PER_TURN
         self.silence_blue = silence_blue
         self.silence_red = silence_red
         self.print_reply = print_reply
+        self.isolate = isolate
+        self.cpu_time = cpu_time
+
+        # Bot Output, silenced bots are only captured, the others are also
+        # printed with their team in front
+        self.red_output = BotOutput("red", output_limit, None if silence_red else sys.stdout)
+        self.blue_output = BotOutput("blue", output_limit, None if silence_blue else sys.stdout)
+        self.output_to_replay = output_to_replay
+        self.output_log = output_log
 
         # Robot Names
         map_name = map_path.split('/')[1].split(".")[0]
@@ -61,7 +117,7 @@ class Game:
         blue_robot_name = blue_path.split('/')[1].split(".")[0]
 
         # replay info
-        self.replay = Replay(
+        self.replay = replay_type(
             game_name,
             map_name,
             self.map.get_height(),
@@ -83,15 +139,22 @@ class Game:
         self.info.update({"red_time":GameConstants.TIME_LIMIT})
         self.info.update({"blue_time":GameConstants.TIME_LIMIT})
         self.info.update({"turn":1})
+        self.info.update({"robot_counter":1})
         self.red_robots = {}
         self.blue_robots = {}
         self.game_state = GameState(self.info, self.red_robots, self.blue_robots, self.replay, self.map)
         
-        # initialize players
-        self.blue_player: Player = import_file(
-            f"bots.{blue_robot_name}", blue_path).BotPlayer(Team.BLUE)
-        self.red_player: Player = import_file(
-            f"bots.{red_robot_name}", red_path).BotPlayer(Team.RED)
+        # initialize players, each bot module is registered under its own
+        # name until the game is closed
+        blue_module = f"bots.{blue_robot_name}_blue"
+        red_module = f"bots.{red_robot_name}_red"
+        if self.isolate:
+            self.blue_player = BotProcess(blue_module, blue_path, Team.BLUE, silence_blue, seed, output_limit)
+            self.red_player = BotProcess(red_module, red_path, Team.RED, silence_red, seed, output_limit)
+        else:
+            self.bot_modules = [blue_module, red_module]
+            self.blue_player: Player = import_file(blue_module, blue_path).BotPlayer(Team.BLUE)
+            self.red_player: Player = import_file(red_module, red_path).BotPlayer(Team.RED)
 
     def get_curr_team(self) -> Team:
         return self.info.get("team")
@@ -100,73 +163,88 @@ class Game:
         """
         Runs an entire game, using the specified object
         """
-        # Play all turns
-        for turn in range(1, self.max_turns+1):
-            # Play Blue Team's Turn
-            self.info.update({"team":Team.BLUE})
-            timeout = self.run_turn(turn, self.blue_player)
-            if timeout: # Declare Red Winner on Timeout
-                self.replay.setWinner("red")
-                if not (self.silence_blue and self.silence_red): 
-                    print(f"Winner: {self.replay.metadata.winner} By Timeout")
-                return self.replay.write_json(self.print_reply)
-            # Play Red Team's Turn
-            self.info.update({"team":Team.RED})
-            timeout = self.run_turn(turn, self.red_player)
-            if timeout: # Declare Blue Winner on Timeout
-                self.replay.setWinner("blue")
-                if not (self.silence_blue and self.silence_red): 
-                    print(f"Winner: {self.replay.metadata.winner} By Timeout")
-                return self.replay.write_json(self.print_reply)
-
-        # Calculate Terra Tiles
-        red_terra_tiles = 0
-        blue_terra_tiles = 0
-        for row in range(self.map.get_height()):
-            for col in range(self.map.get_width()):
-                if (self.map.is_terraformed(Team.BLUE, row, col)):
-                    blue_terra_tiles += 1
-                elif (self.map.is_terraformed(Team.RED, row, col)):
-                    red_terra_tiles += 1
-
-        # Calculate Number of Robots
-        red_robots = len(self.red_robots.keys())
-        blue_robots = len(self.blue_robots.keys())
-
-        # Calculate Metal
-        red_metal = self.info.get('red_metal')
-        blue_metal = self.info.get('blue_metal')
-
-        # Calculate Time
-        red_time = self.info.get('red_time')
-        blue_time = self.info.get('blue_time')
+        # Play all turns, however the game ends the workers are stopped and
+        # the output saved
+        timeout = False
+        try:
+            for turn in range(1, self.max_turns+1):
+                # Play Blue Team's Turn
+                self.info.update({"team":Team.BLUE})
+                if self.run_turn(turn, self.blue_player): # Declare Red Winner on Timeout
+                    self.replay.setWinner("red")
+                    timeout = True
+                    break
+                # Play Red Team's Turn
+                self.info.update({"team":Team.RED})
+                if self.run_turn(turn, self.red_player): # Declare Blue Winner on Timeout
+                    self.replay.setWinner("blue")
+                    timeout = True
+                    break
+
+            # Calculate Scores
+            summary = self.get_summary()
+            self.replay.setSummary(summary)
+            if not timeout:
+                self.replay.setWinner(self.pick_winner(summary))
+        finally:
+            self.close()
+
+        # Save Replay File
+        if not (self.silence_blue and self.silence_red):
+            print(f"Winner: {self.replay.metadata.winner}" + (" By Timeout" if timeout else ""))
+        retJson = self.replay.write_json(self.print_reply)
+        return retJson
+
+    def pick_winner(self, summary: dict) -> str:
+        """
+        Winner of a game played to the end, from its score summary
+        """
+        red_terra_tiles, blue_terra_tiles = summary["red_terraformed"], summary["blue_terraformed"]
+        red_robots, blue_robots = summary["red_robots"], summary["blue_robots"]
+        red_metal, blue_metal = summary["red_metal"], summary["blue_metal"]
+        red_time, blue_time = summary["red_time"], summary["blue_time"]
 
         # Check
         if (red_terra_tiles > blue_terra_tiles):
-            self.replay.setWinner("red")
+            return "red"
         elif (blue_terra_tiles > red_terra_tiles):
-            self.replay.setWinner("blue")
+            return "blue"
         elif (red_robots > blue_robots):
-            self.replay.setWinner("red")
+            return "red"
         elif (blue_robots > red_robots):
-            self.replay.setWinner("blue")
+            return "blue"
         elif (red_metal > blue_metal):
-            self.replay.setWinner("red")
+            return "red"
         elif (blue_metal > red_metal):
-            self.replay.setWinner("blue")
+            return "blue"
         elif (red_time < blue_time):
-            self.replay.setWinner("red")
+            return "red"
         elif (blue_time < red_time):
-            self.replay.setWinner("blue")
+            return "blue"
         else:
             # red wins by default
-            self.replay.setWinner("red")
+            return "red"
 
-        # Save Replay File
-        if not (self.silence_blue and self.silence_red):
-            print(f"Winner: {self.replay.metadata.winner}")
-        retJson = self.replay.write_json(self.print_reply)
-        return retJson
+    def get_score(self, team: Team) -> int:
+        """
+        Number of tiles the team has terraformed so far
+        """
+        return self.map.get_terraformed_count(team)
+
+    def get_summary(self) -> dict:
+        """
+        Score summary of both teams, as used to pick the winner
+        """
+        return {
+            "red_terraformed": self.get_score(Team.RED),
+            "blue_terraformed": self.get_score(Team.BLUE),
+            "red_robots": len(self.red_robots.keys()),
+            "blue_robots": len(self.blue_robots.keys()),
+            "red_metal": self.info.get('red_metal'),
+            "blue_metal": self.info.get('blue_metal'),
+            "red_time": self.info.get('red_time'),
+            "blue_time": self.info.get('blue_time'),
+        }
 
     def run_turn(self, turn: int, player: Player) -> bool:
         """
@@ -208,32 +286,23 @@ class Game:
                     self.replay.add_robot_changes(currRobot, False)
 
 
-        # Suppress Print
-        if(team == Team.BLUE and self.silence_blue):
-            stdout = sys.stdout
-            sys.stdout = open(os.devnull, "w")
-        if(team == Team.RED and self.silence_red):
-            stdout = sys.stdout
-            sys.stdout = open(os.devnull, "w")
-        
-        # Run Thread
-        thread = Thread(target=player.play_turn, args=[self.game_state], daemon=True)
-        funcTime = time.time()
-        thread.start()      
-        thread.join(time_left)
-        funcTime = time.time() - funcTime
-
-        # Restore Print
-        if(team == Team.BLUE and self.silence_blue):
-            sys.stdout = stdout
-        if(team == Team.RED and self.silence_red):
-            sys.stdout = stdout
+        # Run Bot
+        wall_limit = time_left * CPU_WALL_FACTOR if self.cpu_time else time_left
+        if self.isolate:
+            turnTimes = self.run_isolated_turn(team, player, wall_limit)
+        else:
+            turnTimes = self.run_thread_turn(team, player, wall_limit)
+        timeout = turnTimes is None
+        wallTime, cpuTime = turnTimes if not timeout else (None, None)
+        funcTime = cpuTime if self.cpu_time else wallTime
 
         # If there is still time left, automatically lose on timeout
-        if thread.is_alive() or funcTime >= time_left:
+        if timeout or funcTime >= time_left:
             if (team == Team.RED): replay_team = "red"
             else: replay_team = "blue"
-            self.replay.addTurn(replay_team, -1, turn, -1, -1, timeout=True)
+            self.replay.addTurn(replay_team, -1, turn, -1, -1, timeout=True,
+                red_terraformed=self.get_score(Team.RED), blue_terraformed=self.get_score(Team.BLUE),
+                wall_time=wallTime, cpu_time=cpuTime)
             return True
 
         # Change Replay File
@@ -249,5 +318,93 @@ class Game:
             time_left = self.info.get('blue_time')
 
         # Turn Details
-        self.replay.addTurn(replay_team, time_left, len(robots), turn, metal)
+        self.replay.addTurn(replay_team, time_left, len(robots), turn, metal,
+            red_terraformed=self.get_score(Team.RED), blue_terraformed=self.get_score(Team.BLUE),
+            wall_time=wallTime, cpu_time=cpuTime)
         return False
+
+    def run_thread_turn(self, team: Team, player: Player, time_left: float) -> tuple[float, float]:
+        """
+        Plays the turn in a thread on the true game state
+
+        Returns the wall clock and CPU time taken, or None if the bot is
+        still running after time_left seconds
+        """
+        # Capture Print
+        stdout = sys.stdout
+        sys.stdout = self.get_output(team)
+
+        # Run Thread, the CPU clock is read in the bot's own thread
+        cpuTime = []
+        def play_turn():
+            startTime = time.thread_time()
+            try:
+                player.play_turn(self.game_state)
+            finally:
+                cpuTime.append(time.thread_time() - startTime)
+        thread = Thread(target=play_turn, daemon=True)
+        funcTime = time.time()
+        thread.start()      
+        thread.join(time_left)
+        funcTime = time.time() - funcTime
+        self.game_state._expire_infos()
+
+        # Restore Print
+        sys.stdout = stdout
+
+        if thread.is_alive():
+            return None
+        return (funcTime, cpuTime[0])
+
+    def run_isolated_turn(self, team: Team, player: BotProcess, time_left: float) -> tuple[float, float]:
+        """
+        Plays the turn in the bot's worker process, then applies the actions
+        it took to the true game state
+
+        Returns the wall clock and CPU time taken, or None if the worker had
+        to be killed
+        """
+        result = player.play_turn(self.info, self.red_robots, self.blue_robots, self.map, time_left)
+        if result is None:
+            return None
+        actions, funcTime, cpuTime, output = result
+        self.get_output(team).write(output)
+
+        # The worker played on an identical copy, so these succeed in the
+        # same way; should one fail anyway, the turn ends there
+        for method, args in actions:
+            try:
+                getattr(self.game_state, method)(*args)
+            except Exception:
+                traceback.print_exc()
+                break
+        return (funcTime, cpuTime)
+
+    def get_output(self, team: Team) -> BotOutput:
+        return self.red_output if team == Team.RED else self.blue_output
+
+    def close(self):
+        """
+        Stops bot worker processes, if any, saves the bots' output and
+        finishes the replay, later calls do nothing
+        """
+        if self.closed:
+            return
+        self.closed = True
+        if self.isolate:
+            self.blue_player.close()
+            self.red_player.close()
+        else:
+            for module_name in self.bot_modules:
+                sys.modules.pop(module_name, None)
+
+        # Save Bot Output
+        outputs = {"red": self.red_output.getvalue(), "blue": self.blue_output.getvalue()}
+        if self.output_to_replay:
+            self.replay.setBotOutput(outputs)
+        if self.output_log is not None:
+            with open(self.output_log, "a") as outfile:
+                for tag, text in outputs.items():
+                    outfile.write(f"==== {self.replay.metadata.game_name} {tag} ====\n")
+                    outfile.write(text if text.endswith("\n") or not text else text + "\n")
+        self.replay.close()
@@ -60,6 +60,7 @@ class GameConstants:
 
     # TIME CONSTANTS
     TIME_LIMIT = 10 + 1 * NUM_TURNS # base time + time per turn
+    LOAD_TIME_LIMIT = 10            # time for an isolated bot to import and create its player
 
     # Currency Constants
     INIT_BATTERY = 120
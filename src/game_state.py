@@ -3,9 +3,13 @@ from src.map import Map
 from src.robot import Robot, Miner_Robot, Explorer_Robot, Terraformer_Robot, RobotInfo
 from src.game_constants import Team, Direction, TileState, GameConstants, RobotType
 from src.replay import Replay
+from src.layers import MapLayers, build_layers
+from src.pathfinding import PathFinder, distance_field, step_down_field
+from src.forward_model import ForwardModel
 from src.info import *
 from src.errors import *
-from collections import deque
+import weakref
+from array import array
 
 class GameState:
     """ 
@@ -28,10 +32,39 @@ class GameState:
         self.__red_robots: dict[str, Robot] = red_robots
         self.__blue_robots: dict[str, Robot] = blue_robots
 
+        # Occupancy Index, maps (row, col) to the robot standing there
+        self.__occupancy: dict[tuple[int, int], Robot] = {}
+        for robots in (red_robots, blue_robots):
+            for robot in robots.values():
+                self.__occupancy[robot.get_coord()] = robot
+        self.__occupancy_version = 0
+
+        # Search buffers, allocated on first use
+        self.__pathfinder = None
+
+        # Distance to base fields, keyed by (team, checkCollisions)
+        self.__base_fields = {}
+
+        # Bumped whenever a robot changes, see __get_view
+        self.__version = 0
+        self.__view = None
+
+        # LazyGameInfo objects handed out this turn that may still have fields to build
+        self.__lazy_infos = []
+
         # Player Cost Information
         self.__robot_spawn_cost = GameConstants.ROBOT_SPAWN_COST
         self.__robot_transform_cost = GameConstants.ROBOT_TRANSFORM_COST
 
+    def __new_robot_name(self) -> str:
+        """
+        Next robot name of this game, robots are numbered per game so the
+        names don't depend on what else ran in the process
+        """
+        counter = self.__info.get("robot_counter", 1)
+        self.__info.update({"robot_counter": counter + 1})
+        return f"robot_{counter}"
+
     def __str__(self):
         """
         String representation of the GameState object
@@ -39,29 +72,22 @@ class GameState:
         return f""
 
     def check_for_collision(self, row: int, col: int) -> RobotInfo:
-        # Get current robots
+        # Get current team
         currTeam = self.__info.get("team")
-        blue_robots = self.__blue_robots
-        red_robots = self.__red_robots
 
         # Check if grid position is visible
         if self.__map.get_tile_state(row, col, currTeam) == TileState.ILLEGAL:
             return None
 
-        # Check red and blue robots
-        for robot_name in red_robots.keys():
-            if (row, col) == red_robots.get(robot_name).get_coord():
-                return red_robots.get(robot_name).info()
-        for robot_name in blue_robots.keys():
-            if (row, col) == blue_robots.get(robot_name).get_coord():
-                return blue_robots.get(robot_name).info()
-
-        # Otherwise return clear
-        return None
+        # Look up the robot standing on the tile
+        robot = self.__occupancy.get((row, col))
+        if robot is None:
+            return None
+        return robot.info()
 
     def optimal_path(self, startRow: int, startCol: int, endRow: int, endCol: int, checkCollisions=True) -> tuple[Direction,int]:
         '''
-        Find the optimal path using BFS
+        Find the optimal path using A*
         '''
         # Check if positions are valid
         currTeam = self.__info.get("team")
@@ -73,29 +99,17 @@ class GameState:
             return (None, -1)
 
         # Otherwise, preform search
-        visited = set()
-        queue = deque([(None, startRow, startCol, 0)])
-        while (queue):
-            dir, queueRow, queueCol, moves = queue.popleft()
-            if (endRow == queueRow and endCol == queueCol): return (dir, moves)
-            for newDir in Direction:
-                newRow, newCol = queueRow + \
-                    newDir.value[0], queueCol + newDir.value[1]
-                tileState = self.__map.get_tile_state(newRow, newCol, currTeam)
-                # Check if its legal
-                if (tileState == TileState.ILLEGAL or tileState == TileState.IMPASSABLE):
-                    continue
-                if (checkCollisions and self.check_for_collision(newRow, newCol) != None):
-                    continue
-                if ((newRow, newCol) not in visited):
-                    if dir == None:
-                        queue.append((newDir, newRow, newCol, moves+1))
-                    else:
-                        queue.append((dir, newRow, newCol, moves+1))
-                    visited.add((newRow, newCol))
-
-        # If we reached this point, a path to the co-ordinates isn't possible
-        return (None, -1)
+        width = self.__map.get_width()
+        if self.__pathfinder is None:
+            self.__pathfinder = PathFinder(self.__map.get_height(), width)
+        blocked = self.__get_blocked_tiles() if checkCollisions else set()
+        return self.__pathfinder.optimal_path(self.__map.get_passable(currTeam), blocked,
+            startRow * width + startCol, endRow * width + endCol)
+
+    def __get_blocked_tiles(self) -> set:
+        # Flat indices of occupied tiles
+        width = self.__map.get_width()
+        return set(row * width + col for row, col in self.__occupancy)
 
     def robot_to_base(self, robotName: str, checkCollisions=True) -> tuple[Direction,int]:
         '''
@@ -118,32 +132,38 @@ class GameState:
         startTile = self.__map.get_tile_state(startRow, startCol, currTeam)
         if (startTile == TileState.ILLEGAL or startTile == TileState.IMPASSABLE):
             return (None,-1)
+        if (self.__map.is_terraformed(currTeam, startRow, startCol)):
+            return (None, 0)
 
-        # Otherwise, preform search
-        visited = set()
-        queue = deque([(None, startRow, startCol, 0)])
-        while (queue):
-            dir, queueRow, queueCol, moves = queue.popleft()
-            if (self.__map.is_terraformed(currTeam, queueRow, queueCol)):
-                return (dir, moves)
-            for newDir in Direction:
-                newRow, newCol = queueRow + \
-                    newDir.value[0], queueCol + newDir.value[1]
-                tileState = self.__map.get_tile_state(newRow, newCol, currTeam)
-                # Check if its legal
-                if (tileState == TileState.ILLEGAL or tileState == TileState.IMPASSABLE):
-                    continue
-                if (checkCollisions and self.check_for_collision(newRow, newCol) != None):
-                    continue
-                if ((newRow, newCol) not in visited):
-                    if dir == None:
-                        queue.append((newDir, newRow, newCol, moves+1))
-                    else:
-                        queue.append((dir, newRow, newCol, moves+1))
-                    visited.add((newRow, newCol))
-
-        # If we reached this point, a path to a terraform tile isn't possible
-        return (None, -1)
+        # Otherwise, step down the distance field
+        width = self.__map.get_width()
+        field = self.__get_base_field(checkCollisions)
+        return step_down_field(self.__map.get_neighbors(), field, startRow * width + startCol)
+
+    def get_base_distances(self, checkCollisions=True) -> list[list[int]]:
+        '''
+        Number of moves from each tile to the nearest ally terraformed tile,
+        or -1 where the tile can't be entered or no such tile is reachable
+        '''
+        height, width = self.__map.get_height(), self.__map.get_width()
+        field = self.__get_base_field(checkCollisions)
+        return [field[row * width:(row + 1) * width].tolist() for row in range(height)]
+
+    def __get_base_field(self, checkCollisions: bool):
+        # Multi-source BFS from all ally terraformed tiles, cached until the
+        # terraform state, fog of war or robot positions change
+        currTeam = self.__info.get("team")
+        version = (self.__map.get_version(), self.__occupancy_version if checkCollisions else None)
+        cached = self.__base_fields.get((currTeam, checkCollisions))
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        neighbors = self.__map.get_neighbors()
+        blocked = self.__get_blocked_tiles() if checkCollisions else set()
+        field = distance_field(neighbors, self.__map.get_passable(currTeam), blocked,
+            self.__map.get_terraformed_tiles(currTeam))
+        self.__base_fields[(currTeam, checkCollisions)] = (version, field)
+        return field
 
 
     def __assert_can_spawn_robot(self, type: RobotType, row: int, col: int):
@@ -180,6 +200,7 @@ class GameState:
 
     def spawn_robot(self, type: RobotType, row: int, col: int) -> RobotInfo:
         self.__assert_can_spawn_robot(type,row,col)
+        self._load_infos()
 
         # Get current robots
         currTeam = self.__info.get("team")
@@ -201,7 +222,8 @@ class GameState:
                 currTeam,
                 self.__map.get_height(),
                 self.__map.get_width(),
-                GameConstants.MINER_ACTION_COST
+                GameConstants.MINER_ACTION_COST,
+                self.__new_robot_name()
             )
         elif (type == RobotType.EXPLORER):
             new_robot = Explorer_Robot(
@@ -210,7 +232,8 @@ class GameState:
                 currTeam,
                 self.__map.get_height(),
                 self.__map.get_width(),
-                GameConstants.EXPLORER_ACTION_COST
+                GameConstants.EXPLORER_ACTION_COST,
+                self.__new_robot_name()
             )
         else:
             new_robot = Terraformer_Robot(
@@ -219,9 +242,13 @@ class GameState:
                 currTeam,
                 self.__map.get_height(),
                 self.__map.get_width(),
-                GameConstants.TERRAFORMER_ACTION_COST
+                GameConstants.TERRAFORMER_ACTION_COST,
+                self.__new_robot_name()
             )
         robots.update({new_robot.get_name() : new_robot})
+        self.__occupancy[(row, col)] = new_robot
+        self.__occupancy_version += 1
+        self.__version += 1
 
         # Add Robot to Replay File and return
         self.__replay.add_robot_changes(new_robot, False)
@@ -249,6 +276,7 @@ class GameState:
 
     def robot_action(self, robotName: str):
         self.__assert_can_robot_action(robotName)
+        self._load_infos()
 
         # Get current robots
         currTeam = self.get_team()
@@ -257,6 +285,7 @@ class GameState:
         # Take robot action
         currRobot = robots.get(robotName)
         retList = currRobot.take_action(self.__map)
+        self.__version += 1
 
         # Change metal based on action
         if (currRobot.get_type() == RobotType.MINER):
@@ -304,6 +333,7 @@ class GameState:
 
     def move_robot(self, robotName: str, move: Direction) -> bool:
         self.__assert_can_move_robot(robotName, move)
+        self._load_infos()
 
         robots = self.__get_ally_robots_obj()
 
@@ -323,6 +353,10 @@ class GameState:
                 self.__red_robots.pop(altRobotInfo.name)
             else:
                 raise UnknownRobotInternalError(f"Unknown robot - {altRobotInfo}")
+            self.__occupancy.pop((row, col))
+            self.__occupancy.pop((newRow, newCol))
+            self.__occupancy_version += 1
+            self.__version += 1
             # Remove robot in replay file
             self.__replay.add_robot_changes(currRobot, True)
             self.__replay.add_robot_changes(altRobot, True)
@@ -331,6 +365,10 @@ class GameState:
         # Preform Move
         result = currRobot.make_move(move)
         if (result):
+            self.__occupancy.pop((row, col))
+            self.__occupancy[(newRow, newCol)] = currRobot
+            self.__occupancy_version += 1
+            self.__version += 1
             self.__replay.add_robot_changes(currRobot, False)
         return result
 
@@ -362,6 +400,7 @@ class GameState:
 
     def transform_robot(self, robotName: str, type: RobotType) -> RobotInfo:
         self.__assert_can_transform_robot(robotName, type)
+        self._load_infos()
         
         # Get current robots
         currTeam = self.get_team()
@@ -393,7 +432,8 @@ class GameState:
                 currTeam,
                 self.__map.get_height(),
                 self.__map.get_width(),
-                GameConstants.MINER_ACTION_COST
+                GameConstants.MINER_ACTION_COST,
+                self.__new_robot_name()
             )
         elif (type == RobotType.EXPLORER):
             new_robot = Explorer_Robot(
@@ -402,7 +442,8 @@ class GameState:
                 currTeam,
                 self.__map.get_height(),
                 self.__map.get_width(),
-                GameConstants.EXPLORER_ACTION_COST
+                GameConstants.EXPLORER_ACTION_COST,
+                self.__new_robot_name()
             )
         else:
             new_robot = Terraformer_Robot(
@@ -411,12 +452,15 @@ class GameState:
                 currTeam,
                 self.__map.get_height(),
                 self.__map.get_width(),
-                GameConstants.TERRAFORMER_ACTION_COST
+                GameConstants.TERRAFORMER_ACTION_COST,
+                self.__new_robot_name()
             )
         new_robot.set_battery(prevBattery)
 
         # Add New Robot to Replay File
         robots.update({new_robot.get_name() : new_robot})
+        self.__occupancy[(row, col)] = new_robot
+        self.__version += 1
         self.__replay.add_robot_changes(new_robot, False)
         return new_robot.info()
 
@@ -432,11 +476,14 @@ class GameState:
     """ GETTERS """
 
     def get_info(self):
-        # State Game Info
-        return GameInfo(
-            ally_robots=self.get_ally_robots(),
-            enemy_robots=self.get_enemy_robots(),
-            map=self.get_map(),
+        # State Game Info, robots and map are built on first access, or before
+        # the state changes, see LazyGameInfo
+        info = LazyGameInfo(
+            loaders={
+                "ally_robots": self.get_ally_robots,
+                "enemy_robots": self.get_enemy_robots,
+                "map": self.get_map,
+            },
             metal=self.get_metal(),
             team=self.get_team(),
             robot_spawn_cost=self.get_spawn_cost(),
@@ -444,59 +491,157 @@ class GameState:
             time_left=self.get_time_left(),
             turn=self.get_turn(),
         )
+        self.__lazy_infos.append(weakref.ref(info))
+        return info
+
+    def _load_infos(self):
+        """
+        Builds the remaining fields of infos handed out this turn, must be
+        called before the game state changes
+        """
+        for ref in self.__lazy_infos:
+            info = ref()
+            if info is not None:
+                info.load()
+        self.__lazy_infos = []
 
+    def _expire_infos(self):
+        """
+        Ends the turn for infos handed out during it, fields nobody read are
+        never built
+        """
+        for ref in self.__lazy_infos:
+            info = ref()
+            if info is not None:
+                info.expire()
+        self.__lazy_infos = []
+
+
+    def __get_view(self) -> StateView:
+        # Reuse the current view while nothing it was built from has changed.
+        # Robots are also charged and reset between turns, hence team and turn.
+        key = (self.get_team(), self.get_turn(), self.__map.get_version(), self.__version)
+        view = self.__view
+        if view is None or not view.valid or view.key != key:
+            view = self.__view = StateView(key)
+        return view
 
     def get_ally_robots(self) -> dict:
-        # Get current robots
-        if (self.get_team() == Team.BLUE):
-            robots = self.__blue_robots
-        else:
-            robots = self.__red_robots
+        view = self.__get_view()
+        if view.ally_robots is None:
+            # Get current robots
+            if (self.get_team() == Team.BLUE):
+                robots = self.__blue_robots
+            else:
+                robots = self.__red_robots
 
-        # Get all robots
-        retDict = {}
-        for robot_name in robots.keys():
-            retDict[robot_name] = robots.get(robot_name).info()
-        return retDict
+            # Get all robots
+            retDict = {}
+            for robot_name in robots.keys():
+                retDict[robot_name] = view.seal(robots.get(robot_name).info())
+            view.ally_robots = retDict
+        return dict(view.ally_robots)
 
     def get_enemy_robots(self) -> dict:
-        # Get current robots
-        currTeam = self.get_team()
-        if currTeam == Team.BLUE:
-            enemy_robots = self.__red_robots
-        else:
-            enemy_robots = self.__blue_robots
-
-        # Get all robots
-        retDict = {}
-        for robot_name in enemy_robots.keys():
-            # Check if robots are visible
-            row, col = enemy_robots.get(robot_name).get_coord()
-            if (self.__map.get_tile_state(row, col, currTeam) != TileState.ILLEGAL):
-                retDict[robot_name] = enemy_robots.get(robot_name).info()
-        return retDict
+        view = self.__get_view()
+        if view.enemy_robots is None:
+            # Get current robots
+            currTeam = self.get_team()
+            if currTeam == Team.BLUE:
+                enemy_robots = self.__red_robots
+            else:
+                enemy_robots = self.__blue_robots
+
+            # Get all robots, with no fog left every robot is visible
+            retDict = {}
+            fog = self.__map.get_fog_layer(currTeam)
+            allVisible = not self.__map.get_fog_bitboard(currTeam)
+            width = self.__map.get_width()
+            for robot_name, robot in enemy_robots.items():
+                # Check if robots are visible
+                row, col = robot.get_coord()
+                if allVisible or not fog[row * width + col]:
+                    retDict[robot_name] = view.seal(robot.info())
+            view.enemy_robots = retDict
+        return dict(view.enemy_robots)
 
     def get_str_map(self) -> list:
         currTeam = self.get_team()
         return self.__map.get_str_map(currTeam)
 
-    def get_map(self) -> list:
-        # Get CurrTeam and Map
-        currTeam = self.get_team()
-        currMap = self.__map.get_map(currTeam)
-        # Add Robot Info
-        currRobots = self.get_ally_robots()
-        for robot in currRobots:
-            info = currRobots[robot]
-            row, col = info.row, info.col
-            currMap[row][col].robot = info
-        enemyRobots = self.get_enemy_robots()
-        for robot in enemyRobots:
-            info = enemyRobots[robot]
-            row, col = info.row, info.col
-            currMap[row][col].robot = info
-        return currMap
+    def get_map(self) -> tuple:
+        """
+        Read-only grid of TileInfo (None under fog of war), shared between
+        calls until the game state changes
+        """
+        view = self.__get_view()
+        if view.map is None:
+            # Get CurrTeam and Map
+            currTeam = self.get_team()
+            currMap = self.__map.get_map(currTeam)
+            # Add Robot Info
+            currRobots = self.get_ally_robots()
+            for robot in currRobots:
+                info = currRobots[robot]
+                row, col = info.row, info.col
+                currMap[row][col].robot = info
+            enemyRobots = self.get_enemy_robots()
+            for robot in enemyRobots:
+                info = enemyRobots[robot]
+                row, col = info.row, info.col
+                currMap[row][col].robot = info
+            view.map = tuple(tuple(view.seal(tile) if tile is not None else None for tile in tileRow)
+                for tileRow in currMap)
+        return view.map
+
+
+    def get_fog_bitboard(self) -> int:
+        """
+        Fog of war as an int with bit row*width+col set for every tile hidden
+        from the team, for fast set logic with the helpers in src.bitboard
+        """
+        return self.__map.get_fog_bitboard(self.get_team())
+
+    def get_fog_frontier(self) -> int:
+        """
+        Bitboard of the visible, passable tiles next to fog of war
+        """
+        return self.__map.get_fog_frontier(self.get_team())
 
+    def get_map_layers(self) -> MapLayers:
+        """
+        Team-perspective NumPy arrays of the map (requires NumPy), shared
+        between calls until the game state changes
+        """
+        view = self.__get_view()
+        if view.layers is None:
+            allyCoords = [(info.row, info.col) for info in self.get_ally_robots().values()]
+            enemyCoords = [(info.row, info.col) for info in self.get_enemy_robots().values()]
+            view.layers = build_layers(self.__map, self.get_team(), allyCoords, enemyCoords)
+        return view.layers
+
+    def clone(self) -> ForwardModel:
+        """
+        Cheap copy of what the team can see, for trying out actions without
+        changing the game. ForwardModel.clone copies it again.
+        """
+        currTeam = self.get_team()
+        height, width = self.__map.get_height(), self.__map.get_width()
+        fog = self.__map.get_fog_layer(currTeam)
+
+        # Hide the tiles under fog of war
+        state = bytearray(self.__map.get_state_layer())
+        mining = array('H', self.__map.get_mining_layer())
+        terraform = array('b', self.__map.get_terraform_layer())
+        for idx in range(height * width):
+            if fog[idx]:
+                state[idx] = TileState.ILLEGAL.value
+                mining[idx] = 0
+                terraform[idx] = 0
+
+        robots = list(self.get_ally_robots().values()) + list(self.get_enemy_robots().values())
+        return ForwardModel(height, width, currTeam, self.get_turn(), self.get_metal(),
+            self.__info.get("robot_counter", 1), state, mining, terraform, bytearray(fog), robots)
 
     def get_metal(self):
         # Get Metal
@@ -1,5 +1,7 @@
 from src.game_constants import Team, TileState, GameConstants, RobotType, Direction
-from dataclasses import dataclass
+from dataclasses import dataclass, fields
+import copy
+from src.errors import ExpiredGameInfoError
 
 @dataclass
 class RobotInfo:
@@ -42,4 +44,123 @@ class GameInfo:
     robot_spawn_cost: int
     robot_transform_cost: int
     time_left: float
-    turn: int
\ No newline at end of file
+    turn: int
+
+
+class LazyGameInfo(GameInfo):
+    """
+    GameInfo whose map, ally_robots and enemy_robots are built on first access
+    and then kept
+
+    Every field shows the state at the time the info was requested: the game
+    state calls load() before it changes during the turn. Fields still unread
+    when the turn ends are not built, reading them afterwards raises
+    ExpiredGameInfoError, call get_info() again on the new turn.
+    """
+    LAZY_FIELDS = ("ally_robots", "enemy_robots", "map")
+
+    def __init__(self, loaders: dict, **values):
+        self._loaders = loaders
+        self.__dict__.update(values)
+
+    def load(self):
+        """
+        Builds every field that hasn't been accessed yet
+        """
+        if self._loaders is None:
+            return
+        for name in self.LAZY_FIELDS:
+            getattr(self, name)
+        self._loaders = None
+
+    def expire(self):
+        """
+        Drops the fields that haven't been accessed yet
+        """
+        self._loaders = None
+
+
+def _lazy_field(name: str) -> property:
+    def getter(self):
+        if name not in self.__dict__:
+            if self._loaders is None:
+                raise ExpiredGameInfoError(f"GameInfo.{name} of turn {self.turn} was not read during that turn, "
+                    "call get_info() again")
+            self.__dict__[name] = self._loaders[name]()
+        return self.__dict__[name]
+
+    def setter(self, value):
+        self.__dict__[name] = value
+
+    return property(getter, setter)
+
+
+for _name in LazyGameInfo.LAZY_FIELDS:
+    setattr(LazyGameInfo, _name, _lazy_field(_name))
+
+
+class StateView:
+    """
+    Bot-facing copies of the game state, built on first request and reused
+    until the state version they were built at changes
+
+    Info objects handed out from a view are sealed: writing to one marks the
+    view invalid, so the next request builds a clean copy instead of returning
+    what the bot changed. The true game state is never shared.
+    """
+    __slots__ = ("key", "valid", "ally_robots", "enemy_robots", "map", "layers")
+
+    def __init__(self, key: tuple):
+        self.key = key
+        self.valid = True
+        self.ally_robots = None
+        self.enemy_robots = None
+        self.map = None
+        self.layers = None
+
+    def seal(self, info):
+        info.__class__ = _SEALED[info.__class__]
+        info.__dict__["_view"] = self
+        return info
+
+
+class _SealedInfo:
+    _info_class = None
+    _field_names = ()
+
+    def __setattr__(self, name, value):
+        self.__dict__["_view"].valid = False
+        object.__setattr__(self, name, value)
+
+    # Copies and pickles are plain infos, they don't carry the view along
+
+    def __reduce__(self):
+        return (self._info_class, tuple(getattr(self, name) for name in self._field_names))
+
+    def __copy__(self):
+        return self._info_class(*(getattr(self, name) for name in self._field_names))
+
+    def __deepcopy__(self, memo):
+        result = self._info_class(*(copy.deepcopy(getattr(self, name), memo) for name in self._field_names))
+        memo[id(self)] = result
+        return result
+
+    def __eq__(self, other):
+        if isinstance(other, self._info_class):
+            return all(getattr(self, f.name) == getattr(other, f.name) for f in fields(self._info_class))
+        return NotImplemented
+
+    __hash__ = None
+
+
+class _SealedRobotInfo(_SealedInfo, RobotInfo):
+    _info_class = RobotInfo
+    _field_names = tuple(f.name for f in fields(RobotInfo))
+
+
+class _SealedTileInfo(_SealedInfo, TileInfo):
+    _info_class = TileInfo
+    _field_names = tuple(f.name for f in fields(TileInfo))
+
+
+_SEALED = {RobotInfo: _SealedRobotInfo, TileInfo: _SealedTileInfo}
@@ -0,0 +1,67 @@
+from src.game_constants import Team
+from dataclasses import dataclass
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+"""
+NumPy export of the map for vectorized bot logic
+
+NumPy is optional, the engine itself never needs it; only asking for
+layers without it installed raises.
+"""
+
+
+@dataclass
+class MapLayers:
+    """
+    MapLayers object contains team-perspective arrays of shape (height, width).
+    Arrays are read-only, copy them before modifying.
+    """
+    terraform: "np.ndarray"         # int8, ally terraform positive, 0 under fog
+    mining: "np.ndarray"            # uint16, mining yield, 0 under fog
+    passable: "np.ndarray"          # bool, visible and not impassable
+    fog: "np.ndarray"               # bool, hidden from the team
+    ally_robots: "np.ndarray"       # bool, tiles with an ally robot
+    enemy_robots: "np.ndarray"      # bool, tiles with a visible enemy robot
+
+
+def build_layers(map, team: Team, ally_coords: list[tuple[int, int]], enemy_coords: list[tuple[int, int]]) -> MapLayers:
+    """
+    Builds the layers straight from the Map's flat buffers
+    """
+    if np is None:
+        raise ImportError("Map layers require NumPy, install it with `pip install numpy`")
+
+    shape = (map.get_height(), map.get_width())
+    fog = np.frombuffer(map.get_fog_layer(team), dtype=np.uint8).reshape(shape) != 0
+    visible = ~fog
+
+    terraform = np.frombuffer(map.get_terraform_layer(), dtype=np.int8).reshape(shape)
+    if team == Team.RED:
+        terraform = -terraform
+    terraform = np.where(visible, terraform, 0).astype(np.int8)
+    mining = np.where(visible, np.frombuffer(map.get_mining_layer(), dtype=np.uint16).reshape(shape), 0).astype(np.uint16)
+    passable = np.frombuffer(map.get_passable(team), dtype=np.uint8).reshape(shape) != 0
+
+    layers = MapLayers(
+        terraform=terraform,
+        mining=mining,
+        passable=passable,
+        fog=fog,
+        ally_robots=_occupancy(shape, ally_coords),
+        enemy_robots=_occupancy(shape, enemy_coords),
+    )
+    for array in (layers.terraform, layers.mining, layers.passable, layers.fog, layers.ally_robots, layers.enemy_robots):
+        array.flags.writeable = False
+    return layers
+
+
+def _occupancy(shape: tuple[int, int], coords: list[tuple[int, int]]) -> "np.ndarray":
+    grid = np.zeros(shape, dtype=bool)
+    if coords:
+        rows, cols = zip(*coords)
+        grid[list(rows), list(cols)] = True
+    return grid
@@ -1,15 +1,25 @@
 from src.game_constants import Team, TileState, GameConstants, RobotType, Direction
-from random import random, randint, choice, shuffle
-from collections import deque
+from random import Random
+from array import array
 import copy
+import hashlib
 import json
 from os.path import isfile
 from src.info import RobotInfo, TileInfo
 from src.errors import *
 from src.map_validate import val_map_wrap
+from src.bitboard import around_mask, dilate, from_layer, to_indices
+from src.map_binary import BINARY_SUFFIX, read_map, to_json_list
+from src.pathfinding import neighbor_table
 
 
 class Tile:
+    """
+    A single tile, used by MapReader while building a map. Map stores its
+    tiles in flat arrays and hands out TileView objects instead.
+    """
+    __slots__ = ("_state", "_row", "_col", "_terraform", "_fog_of_war_blue", "_fog_of_war_red", "_mining")
+
     def __init__(self, state: TileState, row : int, col : int, fog_of_war_blue : bool,
     fog_of_war_red : bool, terraform : int, mining : int):
         self._state = state
@@ -107,71 +117,289 @@ class Tile:
         return copy.copy(self)
 
 
+TILE_STATES = {state.value: state for state in TileState}
+
+# Byte translation of a fog layer to 1 where the tile is visible
+_VISIBLE = bytes([1]) + bytes(255)
+
+
+class TileView:
+    """
+    Read-only view of one tile of a Map, with the getters of Tile
+
+    The map keeps its tiles in flat arrays, a view only holds the map and the
+    tile's position and reads through to them.
+    """
+    __slots__ = ("_map", "_row", "_col", "_idx")
+
+    def __init__(self, map: "Map", row: int, col: int):
+        self._map = map
+        self._row = row
+        self._col = col
+        self._idx = row * map._width + col
+
+    def get_row(self) -> int:
+        return self._row
+
+    def get_col(self) -> int:
+        return self._col
+
+    def get_state(self) -> TileState:
+        return TILE_STATES[self._map._state_layer[self._idx]]
+
+    def get_terraform(self) -> int:
+        return self._map._terraform_layer[self._idx]
+
+    def get_mining(self) -> int:
+        return self._map._mining_layer[self._idx]
+
+    def get_fog_of_war(self, team: Team) -> bool:
+        return bool(self._map._fog_layer[team][self._idx])
+
+    def is_fog_of_war(self, team: Team) -> bool:
+        return bool(self._map._fog_layer[team][self._idx])
+
+    def get_info(self, team: Team) -> TileInfo:
+        return self._map._tile_info(self._idx, team)
+
+    def string(self, team: Team) -> str:
+        tileInfo = self.get_info(team)
+        if tileInfo == None:
+            return "#"
+        return self._map._tile_str(tileInfo.state, tileInfo.terraform)
+
+    def __str__(self) -> str:
+        return self._map._tile_str(self.get_state(), self.get_terraform())
+
+
 class Map:
-    def __init__(self, path: str = None, radius = 1):
-        # Check Tiles Safety
-        if isfile(path):
-            with open(path) as f:
-                normList = json.load(f)
-            val_map_wrap(normList)
-
-            self._tiles = MapReader.generateMap(normList,radius=radius)
+    def __init__(self, path: str = None, radius = 1, seed: int = None):
+        if isfile(path) and path.endswith(BINARY_SUFFIX):
+            # Binary maps are validated once, when converted
+            height, width, validated, state, terraform, mining = read_map(path)
+            if not validated:
+                val_map_wrap(to_json_list(height, width, state, terraform, mining))
+            fog = MapReader.visualizeBaseLayers(height, width, terraform, radius=radius)
+            # State and mining stay views over the file, terraform changes during the game
+            terraform = array('b', terraform)
         else:
-            self._tiles = MapReader.generateRandMap(GameConstants.MAX_MAP_HEIGHT,GameConstants.MAX_MAP_WIDTH, radius=radius)
-            MapReader.saveMap(self._tiles, path.split('/')[1].split(".")[0])            
+            # Check Tiles Safety
+            if isfile(path):
+                with open(path) as f:
+                    normList = json.load(f)
+                val_map_wrap(normList)
+
+                tiles = MapReader.generateMap(normList,radius=radius)
+            else:
+                tiles = MapReader.generateRandMap(GameConstants.MAX_MAP_HEIGHT,GameConstants.MAX_MAP_WIDTH, radius=radius, seed=seed)
+                MapReader.saveMap(tiles, path.split('/')[1].split(".")[0])
+            height, width = len(tiles), len(tiles[0])
+            state, terraform, mining, fog = MapReader.tilesToLayers(tiles)
 
         # Store Variables
-        self._height = len(self._tiles)
-        self._width = len(self._tiles[0])
+        self._height = height
+        self._width = width
+
+        # Tiles are stored as flat layers indexed by row*width+col
+        size = height * width
+        self._state_layer = state
+        self._terraform_layer = terraform
+        self._mining_layer = mining
+        self._fog_layer = fog
+        # Passable is visible and not impassable, and-ed bytewise as one int
+        impassable = TileState.IMPASSABLE.value
+        standable = int.from_bytes(bytes(state).translate(bytes(0 if value == impassable else 1 for value in range(256))), "little")
+        self._passable = {team: bytearray((int.from_bytes(bytes(fog[team]).translate(_VISIBLE), "little") & standable)
+            .to_bytes(size, "little")) for team in Team}
+
+        # Neighbors of every tile, shared by all maps of this size
+        self._neighbors = neighbor_table(height, width)
+
+        # Bumped whenever a tile's terraform or fog of war changes
+        self._version = 0
+
+        # Number of tiles each team has terraformed, kept up to date by terraform
+        self._terraformed_count = {
+            Team.RED: sum(1 for value in terraform if value < 0),
+            Team.BLUE: sum(1 for value in terraform if value > 0),
+        }
 
         # Store All Initial Map Lists
         self.initial_map_passability = []
         self.initial_map_metal = []
         self.initial_map_terraformed = []
         self.initial_map_visible = []
-        for row in range(self._height):
-            for col in range(self._width):
-                tile = self._tiles[row][col]
+        mineable, redFog, blueFog = TileState.MINING.value, fog[Team.RED], fog[Team.BLUE]
+        for row in range(height):
+            for col in range(width):
+                idx = row * width + col
                 # Add Map Config
-                if tile.get_state() == TileState.IMPASSABLE:
+                if state[idx] == impassable:
                     self.initial_map_passability.append((row,col))
-                elif tile.get_state() == TileState.MINING:
-                    self.initial_map_metal.append((row,col,tile.get_mining()))
-                elif tile.get_terraform() != 0:
-                    self.initial_map_terraformed.append((row,col,tile.get_terraform()))
+                elif state[idx] == mineable:
+                    self.initial_map_metal.append((row,col,mining[idx]))
+                elif terraform[idx] != 0:
+                    self.initial_map_terraformed.append((row,col,terraform[idx]))
                 # Add Fog of War
-                if not tile.get_fog_of_war(Team.RED):
+                if not redFog[idx]:
                     self.initial_map_visible.append((row,col,1))
-                if not tile.get_fog_of_war(Team.BLUE):
+                if not blueFog[idx]:
                     self.initial_map_visible.append((row,col,2))
 
+        # Fog of war and impassable tiles as bitboards, bit row*width+col
+        self._fog_bits = {team: from_layer(self._fog_layer[team]) for team in Team}
+        self._impassable_bits = from_layer(bytes(value == impassable for value in state))
+
+    def __getstate__(self) -> dict:
+        # Layers still backed by a binary map file are copied out for pickling,
+        # the neighbor table is rebuilt from the shared cache when unpickling
+        state = self.__dict__.copy()
+        del state["_neighbors"]
+        if isinstance(state["_state_layer"], memoryview):
+            state["_state_layer"] = bytes(state["_state_layer"])
+        if isinstance(state["_mining_layer"], memoryview):
+            state["_mining_layer"] = array('H', state["_mining_layer"])
+        return state
+
+    def __setstate__(self, state: dict):
+        self.__dict__.update(state)
+        self._neighbors = neighbor_table(self._height, self._width)
+
+    def fork(self) -> "Map":
+        """
+        Independent copy of the map in its current state, for a new game or
+        a simulation branch
+
+        Only what changes during a game is copied: the terraform, fog of war
+        and passability layers and the counters. Dimensions, tile states,
+        mining yields, the neighbor table and the initial map lists are
+        shared with this map and must not be modified.
+        """
+        fork = Map.__new__(Map)
+        fork.__dict__.update(self.__dict__)
+        fork._terraform_layer = self._terraform_layer[:]
+        fork._fog_layer = {team: self._fog_layer[team][:] for team in Team}
+        fork._passable = {team: self._passable[team][:] for team in Team}
+        fork._terraformed_count = dict(self._terraformed_count)
+        fork._fog_bits = dict(self._fog_bits)
+        return fork
+
     def get_height(self) -> int:
         return self._height
 
     def get_width(self) -> int:
         return self._width
 
+    def get_tile(self, row: int, col: int) -> TileView:
+        if (row < 0 or row >= self._height or col < 0 or col >= self._width):
+            return None
+        return TileView(self, row, col)
+
     def is_terraformed(self, team: Team, row: int, col: int) -> bool:
         if (row < 0 or row >= self._height or col < 0 or col >= self._width):
             return None
-        terraform = self._tiles[row][col].get_terraform()
+        terraform = self._terraform_layer[row * self._width + col]
         if (team == Team.RED): return terraform < 0
         else: return terraform > 0
 
     def is_mineable(self, row: int, col: int) -> bool:
         if (row < 0 or row >= self._height or col < 0 or col >= self._width):
             return None
-        return self._tiles[row][col].get_state() == TileState.MINING
+        return self._state_layer[row * self._width + col] == TileState.MINING.value
+
+    def is_fog_of_war(self, row: int, col: int, team: Team) -> bool:
+        return bool(self._fog_layer[team][row * self._width + col])
 
     def get_tile_state(self, row: int, col: int, team: Team) -> TileState:
         if (row < 0 or row >= self._height or col < 0 or col >= self._width):
             return TileState.ILLEGAL
-        if (self._tiles[row][col].is_fog_of_war(team)):
+        idx = row * self._width + col
+        if (self._fog_layer[team][idx]):
             return TileState.ILLEGAL
-        return self._tiles[row][col].get_state()
+        return TILE_STATES[self._state_layer[idx]]
+
+    def get_passable(self, team: Team) -> bytearray:
+        """
+        Flat array indexed by row*width+col, 1 where the team can see a tile
+        that is not impassable. Kept up to date by explore, do not modify.
+        """
+        return self._passable[team]
+
+    def get_fog_layer(self, team: Team) -> bytearray:
+        """
+        Flat array indexed by row*width+col, 1 where the tile is hidden from
+        the team. Kept up to date by explore, do not modify.
+        """
+        return self._fog_layer[team]
+
+    def get_fog_bitboard(self, team: Team) -> int:
+        """
+        Bitboard (int with bit row*width+col set) of the tiles hidden from the
+        team, kept up to date by explore
+        """
+        return self._fog_bits[team]
+
+    def has_fog_around(self, row: int, col: int, team: Team) -> bool:
+        """
+        Whether any tile in the 3x3 area around (row, col) is hidden from the team
+        """
+        return bool(self._fog_bits[team] & around_mask(row, col, self._height, self._width))
+
+    def get_fog_frontier(self, team: Team) -> int:
+        """
+        Bitboard of the tiles the team can see and stand on that border fog of
+        war, where exploring reveals something
+        """
+        fog = self._fog_bits[team]
+        return dilate(fog, self._height, self._width) & ~fog & ~self._impassable_bits
+
+    def get_neighbors(self) -> tuple:
+        """
+        For every flat index, the in-bounds (neighbor index, direction index)
+        pairs, see pathfinding.neighbor_table
+        """
+        return self._neighbors
+
+    def get_state_layer(self) -> bytes:
+        """
+        Flat array of TileState values indexed by row*width+col, without fog
+        of war. Read-only, a view over the file for binary maps.
+        """
+        return self._state_layer
+
+    def get_terraform_layer(self) -> array:
+        """
+        Flat signed array of terraform values (blue positive, red negative)
+        indexed by row*width+col. Kept up to date by terraform, do not modify.
+        """
+        return self._terraform_layer
+
+    def get_mining_layer(self) -> array:
+        """
+        Flat array of mining yields indexed by row*width+col. Read-only, a
+        view over the file for binary maps.
+        """
+        return self._mining_layer
+
+    def get_terraformed_tiles(self, team: Team) -> list[int]:
+        """
+        Flat indices (row*width+col) of the tiles terraformed by the team
+        """
+        if team == Team.RED:
+            return [idx for idx, terraform in enumerate(self._terraform_layer) if terraform < 0]
+        return [idx for idx, terraform in enumerate(self._terraform_layer) if terraform > 0]
+
+    def get_terraformed_count(self, team: Team) -> int:
+        """
+        Number of tiles currently terraformed by the team
+        """
+        return self._terraformed_count[team]
+
+    def get_version(self) -> int:
+        return self._version
 
     def get_terraform_status(self, row: int, col: int) -> int:
-        return self._tiles[row][col].get_terraform()
+        return self._terraform_layer[row * self._width + col]
 
     def terraform(self, row: int, col: int, team : Team) -> bool:
         """
@@ -185,13 +413,28 @@ class Map:
             raise TerraformInternalError(f"Illegal coordinate {row, col, team}")
 
         # Get Tile
-        tile = self._tiles[row][col]
-        tstate = tile.get_state()
+        idx = row * self._width + col
+        tstate = TILE_STATES[self._state_layer[idx]]
         if (tstate != TileState.TERRAFORMABLE):
             raise TerraformInternalError(f"Not a terraformable tile {row, col} {tstate}")
 
         # Terraform Tile
-        return tile.terraform(team)
+        old = self._terraform_layer[idx]
+        if team == Team.BLUE:
+            if (old >= GameConstants.TERRAFORM_MAX): return False
+            new = old + 1
+        else:
+            if (old <= -GameConstants.TERRAFORM_MAX): return False
+            new = old - 1
+        self._terraform_layer[idx] = new
+        self._version += 1
+
+        # Update Scores when the tile changes owner
+        if (old > 0) != (new > 0):
+            self._terraformed_count[Team.BLUE] += 1 if new > 0 else -1
+        if (old < 0) != (new < 0):
+            self._terraformed_count[Team.RED] += 1 if new < 0 else -1
+        return True
 
     def explore(self, row: int, col: int, team : Team) -> list:
         if (row < 0 or row >= self._height or col < 0 or col >= self._width):
@@ -202,21 +445,23 @@ class Map:
             raise ExploreInternalError(f"Illegal coordinate {row, col, team}")
 
         # Get Tile
-        tile = self._tiles[row][col]
-        tstate = tile.get_state()
-        if (tstate == TileState.IMPASSABLE):
+        if (self._state_layer[row * self._width + col] == TileState.IMPASSABLE.value):
             raise ExploreInternalError(f"Impassable tile {row, col}")
 
 
-        # Terraform Tile
+        # Reveal Tiles
+        revealed = self._fog_bits[team] & around_mask(row, col, self._height, self._width)
+        if not revealed:
+            return []
+        self._fog_bits[team] &= ~revealed
+        self._version += 1
+        fog, passable = self._fog_layer[team], self._passable[team]
         exploredTiles = []
-        for addRow in range(-1, 2):
-            for addCol in range(-1, 2):
-                newRow, newCol = row + addRow, col + addCol
-                if (0 <= newCol < self._width and 0 <= newRow < self._height):
-                    newtile = self._tiles[newRow][newCol]
-                    if(newtile.explore(team)):
-                        exploredTiles.append((newRow,newCol))
+        for newIdx in to_indices(revealed):
+            fog[newIdx] = 0
+            exploredTiles.append(divmod(newIdx, self._width))
+            if self._state_layer[newIdx] != TileState.IMPASSABLE.value:
+                passable[newIdx] = 1
         return exploredTiles
 
     def mine(self, row: int, col: int, team : Team) -> list:
@@ -229,28 +474,52 @@ class Map:
             raise MineInternalError(f"Illegal tile {row, col, team}")
 
         # Get Tile
-        tile = self._tiles[row][col]
-        if (tile.get_state() != TileState.MINING): return []
+        if (tstate != TileState.MINING): return []
         
         # Return Mining
-        return [tile.get_mining()]
+        return [self._mining_layer[row * self._width + col]]
+
+    def _tile_info(self, idx: int, team: Team) -> TileInfo:
+        # Return none for fog of war
+        if self._fog_layer[team][idx]:
+            return None
+        # Otherwise, Return TileInfo
+        row, col = divmod(idx, self._width)
+        terraform = self._terraform_layer[idx]
+        if team == Team.RED:
+            terraform = -terraform
+        return TileInfo(TILE_STATES[self._state_layer[idx]], row, col, terraform, self._mining_layer[idx], None)
+
+    @staticmethod
+    def _tile_str(state: TileState, terraform: int) -> str:
+        if state == TileState.TERRAFORMABLE:
+            return str(terraform)
+        elif state == TileState.MINING:
+            return "M"
+        elif state == TileState.IMPASSABLE:
+            return "I"
+        else:
+            raise InvalidTileStateInternalError(f"{state}")
 
     def get_str_map(self, team: Team) -> list[list[str]]:
         retList = []
         for row in range(self._height):
             tileStr = []
             for col in range(self._width):
-                tileStr.append(self._tiles[row][col].string(team))
+                tileInfo = self._tile_info(row * self._width + col, team)
+                tileStr.append("#" if tileInfo is None else self._tile_str(tileInfo.state, tileInfo.terraform))
             retList.append(tileStr)
         return retList
 
     def get_map(self, team: Team) -> list[list[TileInfo]]:
+        fog, states, terraforms, minings = self._fog_layer[team], self._state_layer, self._terraform_layer, self._mining_layer
+        sign = -1 if team == Team.RED else 1
         retList = []
         for row in range(self._height):
-            tileStr = []
-            for col in range(self._width):
-                tileStr.append(self._tiles[row][col].get_info(team))
-            retList.append(tileStr)
+            start = row * self._width
+            retList.append([None if fog[start + col] else
+                TileInfo(TILE_STATES[states[start + col]], row, col, sign * terraforms[start + col], minings[start + col], None)
+                for col in range(self._width)])
         return retList
 
     def __str__(self) -> str:
@@ -258,10 +527,33 @@ class Map:
         for row in range(self._height):
             tileStr = []
             for col in range(self._width):
-                tileStr.append(self._tiles[row][col].__str__())
+                idx = row * self._width + col
+                tileStr.append(self._tile_str(TILE_STATES[self._state_layer[idx]], self._terraform_layer[idx]))
             retList.append("\t".join(tileStr))
         return "\n".join(retList)
 
+# Parsed maps by (file content hash, radius), games in the same process
+# start from a copy of these instead of reading the file again
+_map_templates = {}
+
+
+def load_map(path: str, radius=1, seed: int = None) -> Map:
+    """
+    Map for a new game, parsed once per process for each map file content
+
+    Maps that do not exist yet are generated at random, as with Map, and
+    not cached.
+    """
+    if not isfile(path):
+        return Map(path, radius=radius, seed=seed)
+    with open(path, "rb") as infile:
+        key = (hashlib.blake2b(infile.read(), digest_size=16).digest(), radius)
+    template = _map_templates.get(key)
+    if template is None:
+        template = _map_templates[key] = Map(path, radius=radius)
+    return template.fork()
+
+
 class MapReader: 
     # Generate a map
     @staticmethod
@@ -319,36 +611,51 @@ class MapReader:
         return retTiles
 
     @staticmethod
-    def visualizeBaseTiles(retTiles : list[list[Tile]], radius=1):
-        # Use Height and Width
-        height, width = len(retTiles), len(retTiles[0])
+    def tilesToLayers(tiles : list[list[Tile]]) -> tuple[bytearray, array, array, dict]:
+        """
+        Flat state, terraform, mining and per-team fog layers of a tile grid
+        """
+        flatTiles = [tile for tileRow in tiles for tile in tileRow]
+        state = bytearray(tile.get_state().value for tile in flatTiles)
+        terraform = array('b', [tile.get_terraform() for tile in flatTiles])
+        mining = array('H', [tile.get_mining() for tile in flatTiles])
+        fog = {team: bytearray(1 if tile.get_fog_of_war(team) else 0 for tile in flatTiles) for team in Team}
+        return state, terraform, mining, fog
+
+    @staticmethod
+    def visualizeBaseLayers(height : int, width : int, terraform, radius=1) -> dict:
+        """
+        Per-team fog layers with everything within radius of the team's bases
+        revealed, terraform is the flat terraform layer
+        """
         if(width <= 0 or height <= 0):
             print("0-dimension tiles given")
             raise EnvironmentError
 
-        # Explore Function
-        def explore(row : int, col : int, team : Team) -> None:
-            visited = set()
-            queue = deque([(row, col, radius)])
-            visited.add((row,col))
-            while (queue):
-                queueRow, queueCol, depth = queue.popleft()
-                retTiles[queueRow][queueCol].explore(team)
-                if(depth == 0): continue
-                for newDir in Direction:
-                    newRow, newCol = queueRow + newDir.value[0], queueCol + newDir.value[1]
-                    if 0 <= newRow < height and 0 <= newCol < width and (newRow,newCol) not in visited:
-                        queue.append((newRow, newCol, depth-1))
-                        visited.add((newRow,newCol))
+        # Robots move diagonally, so radius moves from a base is a square
+        fog = {team: bytearray(b"\x01") * (height * width) for team in Team}
+        for idx, value in enumerate(terraform):
+            if value == 0: continue
+            teamFog = fog[Team.BLUE] if value > 0 else fog[Team.RED]
+            row, col = divmod(idx, width)
+            colStart, colEnd = max(col - radius, 0), min(col + radius + 1, width)
+            for newRow in range(max(row - radius, 0), min(row + radius + 1, height)):
+                teamFog[newRow * width + colStart:newRow * width + colEnd] = bytes(colEnd - colStart)
+        return fog
+
+    @staticmethod
+    def visualizeBaseTiles(retTiles : list[list[Tile]], radius=1):
+        # Use Height and Width
+        height, width = len(retTiles), len(retTiles[0])
+        terraform = [tile.get_terraform() for tileRow in retTiles for tile in tileRow]
+        fog = MapReader.visualizeBaseLayers(height, width, terraform, radius=radius)
 
         # Now Explore
         for row in range(height):
             for col in range(width):
-                tile = retTiles[row][col]
-                if tile.get_terraform() > 0:
-                    explore(row,col,Team.BLUE)
-                elif tile.get_terraform() < 0:
-                    explore(row,col,Team.RED)
+                for team in Team:
+                    if not fog[team][row * width + col]:
+                        retTiles[row][col].explore(team)
 
         return
 
@@ -371,15 +678,19 @@ class MapReader:
 
     # Generate a random map
     @staticmethod
-    def generateRandMap(width : int, height : int, impassRatio = 0.2, mineRatio = 0.2, baseRatio = 0.15, radius=1) -> list[list[Tile]]:
+    def generateRandMap(width : int, height : int, impassRatio = 0.2, mineRatio = 0.2, baseRatio = 0.15, radius=1,
+        seed : int = None) -> list[list[Tile]]:
         # Check Dimensions
         if (width <= 0 or height <= 0):
             raise InvalidMapError(f"generateRandMap - invalid width/height given, w:{width} h:{height}")
 
+        # Same seed, same map
+        rng = Random(seed)
+
         # Check Reflection Type
-        reflect = choice(["diagonal","horizontal","vertical"])
+        reflect = rng.choice(["diagonal","horizontal","vertical"])
         tiles = [(row,col) for col in range(width) for row in range(height)]
-        shuffle(tiles)
+        rng.shuffle(tiles)
 
         #Populate Tiles
         retTiles = [[Tile(TileState.TERRAFORMABLE, row, col, True, True, 0, 0) for col in range(width)] for row in range(height)]
@@ -395,7 +706,7 @@ class MapReader:
         mineTiles = int(width*height*mineRatio/2)
         for row, col in tiles[impassTiles:impassTiles+mineTiles]:
             altRow, altCol = MapReader.makeReflectTile(width,height,row,col,type=reflect)
-            mineNum = randint(GameConstants.MINING_MIN,GameConstants.MINING_MAX)
+            mineNum = rng.randint(GameConstants.MINING_MIN,GameConstants.MINING_MAX)
             retTiles[row][col] = Tile(TileState.MINING, row, col, True, True, 0, mineNum)
             retTiles[altRow][altCol] = Tile(TileState.MINING, altRow, altCol, True, True, 0, mineNum)
 
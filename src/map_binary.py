@@ -0,0 +1,161 @@
+from src.game_constants import TileState
+from src.errors import *
+from src.map_validate import validate_map
+from pathlib import Path
+from array import array
+import struct
+import json
+import mmap
+import sys
+
+"""
+Compact binary map format (.awap23b)
+
+A fixed 16 byte little-endian header followed by the tiles as packed
+arrays in row-major order:
+
+    magic     4s   b"AWMB"
+    version   u16  FORMAT_VERSION
+    flags     u16  FLAG_VALIDATED once validate_map passed at conversion
+    height    u16
+    width     u16
+    reserved  4x
+    state     height*width u8   TileState value
+    terraform height*width i8
+    mining    height*width u16
+
+Maps are converted from .awap23m once, validation happens then and is
+recorded in the header, and loading is an mmap with views over the
+arrays instead of a JSON parse.
+"""
+
+MAGIC = b"AWMB"
+FORMAT_VERSION = 1
+FLAG_VALIDATED = 1
+HEADER = struct.Struct("<4sHHHH4x")
+JSON_SUFFIX = ".awap23m"
+BINARY_SUFFIX = ".awap23b"
+
+TILE_CODES = {"T": TileState.TERRAFORMABLE, "I": TileState.IMPASSABLE, "M": TileState.MINING}
+
+
+def convert_map(json_path: str, binary_path: str = None) -> str:
+    """
+    Converts a .awap23m map to the binary format, next to it unless
+    binary_path is given. Raises InvalidMapError if the map does not
+    validate, so every converted map carries the validated flag.
+    """
+    if binary_path is None:
+        binary_path = str(Path(json_path).with_suffix(BINARY_SUFFIX))
+    with open(json_path) as infile:
+        normList = json.load(infile)
+
+    # Validate Once
+    try:
+        validate_map(Path(json_path).name, normList)
+    except AssertionError as e:
+        raise InvalidMapError(f"{json_path} does not validate: {e}")
+
+    # Pack Tiles
+    height, width = len(normList), len(normList[0])
+    state = bytearray()
+    terraform = array('b')
+    mining = array('H')
+    for rowIdx, row in enumerate(normList):
+        for colIdx, tile in enumerate(row):
+            typs = tuple(type(x) for x in tile)
+            if typs != (str, int, int):
+                raise InvalidMapError(f"Map file elements need to be (str, int, int), received {typs}:{tile} at {rowIdx, colIdx}")
+            code, terra, mine = tile
+            state.append(TILE_CODES[code].value)
+            terraform.append(terra)
+            mining.append(mine)
+    if sys.byteorder != "little":
+        mining.byteswap()
+
+    with open(binary_path, "wb") as outfile:
+        outfile.write(HEADER.pack(MAGIC, FORMAT_VERSION, FLAG_VALIDATED, height, width))
+        outfile.write(state)
+        outfile.write(terraform.tobytes())
+        outfile.write(mining.tobytes())
+    return binary_path
+
+
+def read_map(binary_path: str) -> tuple[int, int, bool, memoryview, memoryview, memoryview]:
+    """
+    Maps a binary map into memory
+
+    Returns height, width, whether it was validated, and read-only views of
+    the state (u8), terraform (i8) and mining (u16) arrays backed by the
+    file, nothing is copied.
+    """
+    with open(binary_path, "rb") as infile:
+        try:
+            buffer = mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            raise InvalidMapError(f"{binary_path} is empty")
+
+    # Check Header
+    if len(buffer) < HEADER.size:
+        raise InvalidMapError(f"{binary_path} is too short for a map header")
+    magic, version, flags, height, width = HEADER.unpack_from(buffer)
+    if magic != MAGIC:
+        raise InvalidMapError(f"{binary_path} is not a binary map")
+    if version != FORMAT_VERSION:
+        raise InvalidMapError(f"{binary_path} has format version {version}, expected {FORMAT_VERSION}")
+    size = height * width
+    if size == 0 or len(buffer) != HEADER.size + 4 * size:
+        raise InvalidMapError(f"{binary_path} does not match its {height}x{width} header")
+
+    # Views Over The File
+    view = memoryview(buffer)
+    start = HEADER.size
+    state = view[start:start + size]
+    terraform = view[start + size:start + 2 * size].cast('b')
+    mining = view[start + 2 * size:start + 4 * size]
+    if sys.byteorder == "little":
+        mining = mining.cast('H')
+    else:
+        mining = array('H', mining.tobytes())
+        mining.byteswap()
+    return height, width, bool(flags & FLAG_VALIDATED), state, terraform, mining
+
+
+def to_json_list(height: int, width: int, state, terraform, mining) -> list[list[list]]:
+    """
+    The map in the .awap23m layout, for validating a map that was not
+    validated at conversion
+    """
+    codes = {tileState.value: code for code, tileState in TILE_CODES.items()}
+    return [[[codes.get(state[idx], "?"), terraform[idx], mining[idx]] for idx in range(row * width, (row + 1) * width)]
+        for row in range(height)]
+
+
+def map_path(name: str, folder: str = "maps") -> str:
+    """
+    Path of the named map, the binary version when there is one at least as
+    new as the .awap23m
+    """
+    jsonPath = Path(folder) / f"{name}{JSON_SUFFIX}"
+    binaryPath = Path(folder) / f"{name}{BINARY_SUFFIX}"
+    if binaryPath.exists() and (not jsonPath.exists() or binaryPath.stat().st_mtime >= jsonPath.stat().st_mtime):
+        return str(binaryPath)
+    return str(jsonPath)
+
+
+def convert_maps(folder: str = "maps"):
+    """
+    Converts every .awap23m map in the folder
+    """
+    goods, bads = [], []
+    for path in sorted(Path(folder).glob(f"*{JSON_SUFFIX}")):
+        try:
+            binaryPath = convert_map(str(path))
+        except InvalidMapError as e:
+            print(f"bad map {path.name}: {e}")
+            bads.append(path.name)
+        else:
+            print(f"{path.name} -> {Path(binaryPath).name}")
+            goods.append(path.name)
+    print("Converted:", goods)
+    print("Bads:", bads)
@@ -1,8 +1,20 @@
 from src.game_constants import GameConstants
+from src.pathfinding import distance_field, neighbor_table
+from multiprocessing import Pool
 from pathlib import Path
+import hashlib
 import json
 import traceback
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Bump when a change to the validators should invalidate cached results
+VALIDATOR_VERSION = 2
+CACHE_FILE = ".validation_cache.json"
+
 def get_rot_sym( height, width):
     def rot_sym(r, c):
         return height - r - 1, width - c - 1
@@ -104,31 +116,268 @@ def validate_map(map_name, map):
 
 
 
-def val_maps():
-    map_folder = Path("./maps")
-    files = list(map_folder.glob("*.awap23m"))
-    # print(files)
+# Array flips for each symmetry, matching get_*_sym
+SYM_FLIPS = {
+    "rot": lambda a: a[::-1, ::-1],
+    "hor": lambda a: a[::-1, :],
+    "ver": lambda a: a[:, ::-1],
+}
 
-    goods = []
-    bads = []
-    for p in files:
-        fname = p.name
-        print("Checking", fname)
-        with open(p, "r") as f:
-            obj = json.load(f)
 
-            try:
-                validate_map(fname, obj)
-            except AssertionError:
-                traceback.print_exc()
-                print(f"bad map {fname}")
-                bads += [fname]
-            else:
-                print(f"good map {fname}")
-                goods += [fname]
+def map_arrays(map) -> tuple["np.ndarray", "np.ndarray", "np.ndarray"]:
+    """
+    Tile codes, terraform and mining of a map in the .awap23m layout as
+    (height, width) arrays
+    """
+    try:
+        tiles = np.array(map, dtype=object)
+    except ValueError:
+        tiles = None
+    assert tiles is not None and tiles.ndim == 3 and tiles.shape[2] == 3, "tiles need to be [state, terraform, mining]"
+    return tiles[:, :, 0].astype(str), tiles[:, :, 1].astype(np.int64), tiles[:, :, 2].astype(np.int64)
+
+
+def validate_map_np(map_name, map) -> dict:
+    """
+    Vectorized validate_map (requires NumPy)
+
+    Raises AssertionError on the same problems as validate_map, otherwise
+    returns a report of the map's symmetries and what each team starts
+    with. A symmetry is fair when it maps the terrain onto itself and every
+    base onto one of the other team's.
+    """
+    if np is None:
+        raise ImportError("The vectorized validator requires NumPy, install it with `pip install numpy`")
+    assert type(map) == list, "map is not a list"
+    assert len(map) > 0, "map is an empty list"
+
+    height, width = len(map), len(map[0])
+
+    assert GameConstants.MIN_MAP_HEIGHT <= height <= GameConstants.MAX_MAP_HEIGHT, f"bad height {height}"
+    assert GameConstants.MIN_MAP_WIDTH <= width <= GameConstants.MAX_MAP_WIDTH, f"bad width {width}"
+    for row in range(height):
+        assert len(map[row]) == width, f"bad map {map_name} weird row {row}"
+
+    codes, terr, mine = map_arrays(map)
+
+    # Tile invariants, the first bad tile in row-major order is reported
+    impass, terra, mining = codes == "I", codes == "T", codes == "M"
+    bad = ((impass & ((terr != 0) | (mine != 0)))
+        | (terra & ((mine != 0) | ~np.isin(terr, [-5, 0, 5])))
+        | (mining & ((terr != 0) | (mine < GameConstants.MINING_MIN) | (mine > GameConstants.MINING_MAX)))
+        | ~(impass | terra | mining))
+    if bad.any():
+        row, col = (int(x) for x in np.argwhere(bad)[0])
+        status = f"t:{terr[row, col]} m:{mine[row, col]}"
+        assert not impass[row, col], f"weird impass {status} at {row, col}"
+        assert not terra[row, col], f"weird terr {status} at {row, col}"
+        assert not mining[row, col], f"weird mine {status} at {row, col}"
+        assert False, f"unknown tile state {codes[row, col]}"
+
+    # Symmetries, all three checked on whole arrays
+    symmetry = {}
+    for sname, flip in SYM_FLIPS.items():
+        terrain = (flip(codes) != codes) | (flip(mine) != mine)
+        symmetry[sname] = {
+            "terrain_mismatches": int(terrain.sum()),
+            "swapped_base_mismatches": int((flip(terr) != -terr).sum()),
+        }
+    fair = [sname for sname, counts in symmetry.items()
+        if counts["terrain_mismatches"] == 0 and counts["swapped_base_mismatches"] == 0]
+
+    return {
+        "name": map_name,
+        "height": height,
+        "width": width,
+        "symmetry": symmetry,
+        "fair_symmetries": fair,
+        "fair": len(fair) > 0,
+        "red_bases": int((terr < 0).sum()),
+        "blue_bases": int((terr > 0).sum()),
+        "mines": int(mining.sum()),
+        "mining_total": int(mine[mining].sum()),
+        "impassable": int(impass.sum()),
+    }
+
+
+def analyze_layers(height, width, passable, terraform, mining, margin=0) -> dict:
+    """
+    Fairness metrics of a map given as flat row-major layers
+
+    passable is 1 for every tile that is not impassable, terraform is
+    negative on red bases and positive on blue ones, mining is the yield of
+    each mine and 0 elsewhere. Distances are robot moves (diagonals
+    included) from the nearest base of the team, found with one
+    multi-source BFS per team. A tile is contested when both teams reach
+    it and their distances differ by at most margin, otherwise it counts
+    (with its mining) for the team that gets there first.
+    """
+    neighbors = neighbor_table(height, width)
+    size = height * width
+    mines = [idx for idx in range(size) if mining[idx] > 0]
+
+    # Distance Fields
+    fields = {}
+    teams = {}
+    for team, sources in (("red", [idx for idx in range(size) if terraform[idx] < 0]),
+            ("blue", [idx for idx in range(size) if terraform[idx] > 0])):
+        field = fields[team] = distance_field(neighbors, passable, set(), sources)
+        mineDistances = [field[idx] for idx in mines if field[idx] != -1]
+        teams[team] = {
+            "bases": len(sources),
+            "reachable_tiles": size - field.count(-1),
+            "reachable_mines": len(mineDistances),
+            "reachable_mining": sum(mining[idx] for idx in mines if field[idx] != -1),
+            "nearest_mine": min(mineDistances, default=-1),
+        }
+
+    # Contested Tiles, and the mining on tiles one team gets to first
+    contested, redCloser, blueCloser = 0, 0, 0
+    closerMining = {"red": 0, "blue": 0}
+    for idx, (red, blue) in enumerate(zip(fields["red"], fields["blue"])):
+        if red == -1 and blue == -1:
+            continue
+        if red != -1 and blue != -1 and abs(red - blue) <= margin:
+            contested += 1
+        elif blue == -1 or (red != -1 and red < blue):
+            redCloser += 1
+            closerMining["red"] += mining[idx]
+        else:
+            blueCloser += 1
+            closerMining["blue"] += mining[idx]
+    for team in teams:
+        teams[team]["closer_mining"] = closerMining[team]
+
+    # Connected Components of passable terrain
+    label = [0] * size
+    components = []
+    for start in range(size):
+        if not passable[start] or label[start]:
+            continue
+        label[start] = len(components) + 1
+        stack = [start]
+        count = 0
+        while stack:
+            idx = stack.pop()
+            count += 1
+            for nidx, _ in neighbors[idx]:
+                if passable[nidx] and not label[nidx]:
+                    label[nidx] = label[start]
+                    stack.append(nidx)
+        components.append(count)
+
+    red, blue = teams["red"], teams["blue"]
+    return {
+        "red": red,
+        "blue": blue,
+        "contested_tiles": contested,
+        "red_closer_tiles": redCloser,
+        "blue_closer_tiles": blueCloser,
+        "components": sorted(components, reverse=True),
+        "balanced": (red["reachable_mining"] == blue["reachable_mining"] and red["closer_mining"] == blue["closer_mining"]
+            and red["nearest_mine"] == blue["nearest_mine"] and redCloser == blueCloser),
+    }
+
+
+def analyze_map(map, margin=0) -> dict:
+    """
+    Fairness metrics of a valid map in the .awap23m layout, see analyze_layers
+    """
+    height, width = len(map), len(map[0])
+    tiles = [tile for row in map for tile in row]
+    passable = bytes(tile[0] != "I" for tile in tiles)
+    terraform = [tile[1] for tile in tiles]
+    mining = [tile[2] if tile[0] == "M" else 0 for tile in tiles]
+    return analyze_layers(height, width, passable, terraform, mining, margin)
+
+
+def file_hash(path) -> str:
+    with open(path, "rb") as f:
+        return hashlib.blake2b(f.read(), digest_size=16).hexdigest()
+
+
+def check_map_file(path) -> dict:
+    """
+    Validates one map file, with the vectorized validator when NumPy is
+    installed
+    """
+    path = Path(path)
+    result = {"name": path.name, "hash": file_hash(path), "version": VALIDATOR_VERSION,
+        "good": False, "error": None, "report": None, "fairness": None}
+    try:
+        with open(path, "r") as f:
+            obj = json.load(f)
+        if np is not None:
+            result["report"] = validate_map_np(path.name, obj)
+        else:
+            validate_map(path.name, obj)
+    except (AssertionError, ValueError) as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    else:
+        result["good"] = True
+        result["fairness"] = analyze_map(obj)
+    return result
+
+
+def val_maps(map_folder="./maps", processes=None, use_cache=True):
+    """
+    Validates every map in the folder in parallel
+
+    Results are cached in the folder by file hash, so only new or changed
+    maps are validated again.
+    """
+    map_folder = Path(map_folder)
+    files = sorted(map_folder.glob("*.awap23m"))
+    cache_path = map_folder / CACHE_FILE
+
+    # Load Cache
+    cache = {}
+    if use_cache and cache_path.exists():
+        try:
+            with open(cache_path) as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            cache = {}
+
+    # Validate Changed Maps
+    results = {}
+    todo = []
+    for p in files:
+        cached = cache.get(file_hash(p))
+        if cached is not None and cached.get("version") == VALIDATOR_VERSION:
+            results[p.name] = dict(cached, name=p.name, cached=True)
+        else:
+            todo.append(p)
+    if len(todo) > 1 and processes != 1:
+        with Pool(processes=min(len(todo), processes or len(todo))) as pool:
+            checked = pool.map(check_map_file, todo)
+    else:
+        checked = [check_map_file(p) for p in todo]
+    for result in checked:
+        results[result["name"]] = dict(result, cached=False)
+        cache[result["hash"]] = result
+
+    # Save Cache
+    if use_cache and checked:
+        with open(cache_path, "w") as f:
+            json.dump(cache, f, indent=2)
+
+    # Print Results
+    goods, bads = [], []
+    for p in files:
+        result = results[p.name]
+        tag = " (cached)" if result["cached"] else ""
+        if result["good"]:
+            report = result["report"]
+            sym = "" if report is None else f", fair symmetry: {', '.join(report['fair_symmetries']) or 'none'}"
+            fairness = result["fairness"]
+            mining = f", reachable mining red {fairness['red']['reachable_mining']} blue {fairness['blue']['reachable_mining']}"
+            print(f"good map {p.name}{sym}{mining}{tag}")
+            goods += [p.name]
+        else:
+            print(f"bad map {p.name}: {result['error']}{tag}")
+            bads += [p.name]
 
-            print("\n\n")
-            # print(str(obj)[:50])
-    
     print("Goods:", goods)
-    print("Bads:", bads)
\ No newline at end of file
+    print("Bads:", bads)
+    return results
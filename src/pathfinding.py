@@ -0,0 +1,157 @@
+from src.game_constants import Direction
+from array import array
+from functools import lru_cache
+from heapq import heappush, heappop
+from collections import deque
+
+"""
+Grid search used by GameState
+
+Tiles are addressed by their flat index row*width+col. Passability comes
+from Map.get_passable and occupied tiles are passed in as a set of flat
+indices, so a search never touches Tile objects.
+"""
+
+DIRECTIONS = list(Direction)
+
+
+@lru_cache(maxsize=None)
+def neighbor_table(height: int, width: int) -> tuple[tuple[tuple[int, int], ...], ...]:
+    """
+    For every flat index, the in-bounds (neighbor index, direction index)
+    pairs, in Direction order
+    """
+    table = []
+    for row in range(height):
+        for col in range(width):
+            entries = []
+            for dirIndex, newDir in enumerate(DIRECTIONS):
+                newRow, newCol = row + newDir.value[0], col + newDir.value[1]
+                if 0 <= newRow < height and 0 <= newCol < width:
+                    entries.append((newRow * width + newCol, dirIndex))
+            table.append(tuple(entries))
+    return tuple(table)
+
+
+def distance_field(neighbors: tuple, passable: bytearray, blocked: set, sources: list[int]) -> array:
+    """
+    Multi-source breadth first search
+
+    Returns, for every flat index, the number of moves to the nearest source,
+    moving only through passable tiles that are not blocked. Tiles that can't
+    be entered or reached are -1.
+    """
+    field = array('i', [-1]) * len(passable)
+    queue = deque()
+    for idx in sources:
+        if passable[idx] and idx not in blocked and field[idx] == -1:
+            field[idx] = 0
+            queue.append(idx)
+    while queue:
+        idx = queue.popleft()
+        moves = field[idx] + 1
+        for nidx, _ in neighbors[idx]:
+            if field[nidx] == -1 and passable[nidx] and nidx not in blocked:
+                field[nidx] = moves
+                queue.append(nidx)
+    return field
+
+
+def step_down_field(neighbors: tuple, field: array, idx: int) -> tuple[Direction, int]:
+    """
+    First move and length of a shortest path from idx down a distance field,
+    taking the earliest direction in Direction order on ties
+    """
+    bestDir, best = None, -1
+    for nidx, dirIndex in neighbors[idx]:
+        moves = field[nidx]
+        if moves != -1 and (best == -1 or moves < best):
+            bestDir, best = DIRECTIONS[dirIndex], moves
+    if best == -1:
+        return (None, -1)
+    return (bestDir, best + 1)
+
+
+class PathFinder:
+    """
+    A* search over a flat passability array
+
+    The visited/cost buffers are allocated once per map and reused between
+    searches; a search stamp marks which entries belong to the current search
+    so nothing has to be cleared.
+    """
+
+    def __init__(self, height: int, width: int):
+        self._height = height
+        self._width = width
+        self._neighbors = neighbor_table(height, width)
+        self._cost = array('i', [0]) * (height * width)
+        self._seen = array('I', [0]) * (height * width)
+        self._closed = array('I', [0]) * (height * width)
+        self._stamp = 0
+
+    def optimal_path(self, passable: bytearray, blocked: set, start: int, end: int) -> tuple[Direction, int]:
+        """
+        First move and length of a shortest path from start to end
+
+        Every tile after the start must be passable and not blocked. When
+        several first moves lead to a shortest path, the earliest one in
+        Direction order is returned, which is the move a breadth first search
+        expanding in Direction order would have picked.
+
+        The search runs backwards from end towards the tiles around start, with
+        the octile distance to start (minus the final step) as heuristic.
+        """
+        if start == end:
+            return (None, 0)
+        if end in blocked:
+            return (None, -1)
+
+        # Fresh search stamp
+        self._stamp += 1
+        stamp = self._stamp
+        cost, seen, closed = self._cost, self._seen, self._closed
+        neighbors, width = self._neighbors, self._width
+
+        # Tiles around start are the goals
+        startRow, startCol = divmod(start, width)
+        goals = set(nidx for nidx, _ in neighbors[start])
+
+        def heuristic(idx: int) -> int:
+            row, col = divmod(idx, width)
+            return max(abs(row - startRow), abs(col - startCol)) - 1
+
+        # Otherwise, preform search
+        best = -1
+        cost[end] = 0
+        seen[end] = stamp
+        h = heuristic(end)
+        queue = [(h, h, end)]
+        while queue:
+            f, h, idx = heappop(queue)
+            if best != -1 and f > best:
+                break
+            if closed[idx] == stamp:
+                continue
+            closed[idx] = stamp
+            moves = cost[idx]
+            if idx in goals and best == -1:
+                best = moves
+            for nidx, _ in neighbors[idx]:
+                if not passable[nidx] or nidx in blocked or closed[nidx] == stamp:
+                    continue
+                if seen[nidx] != stamp or moves + 1 < cost[nidx]:
+                    seen[nidx] = stamp
+                    cost[nidx] = moves + 1
+                    h = heuristic(nidx)
+                    heappush(queue, (moves + 1 + h, h, nidx))
+
+        # If we reached this point without a goal, a path isn't possible
+        if best == -1:
+            return (None, -1)
+
+        # Earliest direction out of start that begins a shortest path
+        for nidx, dirIndex in neighbors[start]:
+            if closed[nidx] == stamp and cost[nidx] == best:
+                return (DIRECTIONS[dirIndex], best + 1)
+        return (None, -1)
@@ -15,6 +15,10 @@ class Turn:
     tiles_explored: list[tuple[int, int]]
     tiles_terraformed: list[tuple[int, int]]
     robot_changes: list[tuple[str, int, int, str, int]]
+    red_terraformed: int = 0
+    blue_terraformed: int = 0
+    wall_time: float = None
+    cpu_time: float = None
 
 @dataclass
 class ReplayMetadata:
@@ -62,6 +66,8 @@ class Replay:
         self.explored_tiles = []
         self.terraformed_tiles = []
         self.robot_changes = []
+        self.summary = None
+        self.bot_output = None
 
     def add_explored_tiles(self, tiles: list[tuple[int, int]]) -> None:
         self.explored_tiles.extend(tiles)
@@ -96,7 +102,8 @@ class Replay:
             entry.append("blue")
         self.robot_changes.append(tuple(entry))
 
-    def addTurn(self, team: str, time_left : float, num_robots : int, turn_number: int, metal: int, timeout = False):
+    def addTurn(self, team: str, time_left : float, num_robots : int, turn_number: int, metal: int, timeout = False,
+        red_terraformed: int = 0, blue_terraformed: int = 0, wall_time: float = None, cpu_time: float = None):
         # If timeout, than add turn while ignoring tiles
         if timeout:
             turn = Turn(
@@ -107,9 +114,13 @@ class Replay:
                 time_left,
                 [],
                 [],
-                []
+                [],
+                red_terraformed,
+                blue_terraformed,
+                wall_time,
+                cpu_time
             )
-            self.turns.append(turn)
+            self.record_turn(turn)
             return
         # Add Turn
         turn = Turn(
@@ -120,25 +131,50 @@ class Replay:
             time_left,
             self.explored_tiles,
             self.terraformed_tiles,
-            self.robot_changes
+            self.robot_changes,
+            red_terraformed,
+            blue_terraformed,
+            wall_time,
+            cpu_time
         )
-        self.turns.append(turn)
+        self.record_turn(turn)
         # Empty Lists
         self.explored_tiles = []
         self.terraformed_tiles = []
         self.robot_changes = []
 
+    def record_turn(self, turn: Turn) -> None:
+        self.turns.append(turn)
+
     def setWinner(self, team: str):
         self.metadata.winner = team
 
-    def write_json(self, print_reply):
+    def setSummary(self, summary: dict):
+        self.summary = summary
+
+    def setBotOutput(self, output: dict):
+        self.bot_output = output
+
+    def get_header(self) -> dict:
         # Get Metadata
-        retDict = self.metadata.__dict__
+        retDict = dict(self.metadata.__dict__)
         # Add Lists of Initial Information
         retDict['initial_map_passability'] = self.initial_map_passability
         retDict['initial_map_metal'] = self.initial_map_metal
         retDict['initial_map_terraformed'] = self.initial_map_terraformed
         retDict['initial_map_visible'] = self.initial_map_visible
+        if self.bot_output is not None:
+            retDict['bot_output'] = self.bot_output
+        return retDict
+
+    def close(self) -> None:
+        """
+        Finishes anything the replay keeps open, safe to call more than once
+        """
+        pass
+
+    def write_json(self, print_reply):
+        retDict = self.get_header()
         # Add List
         turnDict = [i.__dict__ for i in self.turns]
         retDict['turns'] = turnDict
@@ -153,3 +189,104 @@ class Replay:
             with open(f"replays/{self.metadata.game_name}.awap23r", "w") as outfile:
                 outfile.write(retJson)
         return retJson
+
+
+class StreamingReplay(Replay):
+    """
+    Replay that appends every turn to disk as it is played, so memory stays
+    flat however long the game is
+
+    The file at replays/<game_name>.awap23r.jsonl holds one JSON object per
+    line: {"header": ...} with the metadata and initial map, one {"turn": ...}
+    per turn, then {"footer": {"winner": ...}} once the game is over (with
+    the bots' output, if saved). Use
+    StreamingReplay.to_json to turn it into a regular replay.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        path = pathlib.Path("replays/")
+        path.mkdir(parents=True, exist_ok=True)
+        self.path = path / f"{self.metadata.game_name}.awap23r.jsonl"
+        self._outfile = open(self.path, "w")
+        self._write_line("header", self.get_header())
+
+    def _write_line(self, key: str, value) -> None:
+        self._outfile.write(json.dumps({key: value}, separators=(',', ':')))
+        self._outfile.write("\n")
+
+    def record_turn(self, turn: Turn) -> None:
+        self._write_line("turn", turn.__dict__)
+
+    def close(self) -> None:
+        """
+        Finalizes the stream with the winner and closes the file, later
+        calls do nothing
+        """
+        if not self._outfile.closed:
+            footer = {"winner": self.metadata.winner}
+            if self.bot_output is not None:
+                footer["bot_output"] = self.bot_output
+            self._write_line("footer", footer)
+            self._outfile.close()
+
+    def write_json(self, print_reply):
+        """
+        Finalizes the stream with the winner. Returns the whole replay as
+        JSON when print_reply is set, like Replay, otherwise only the metadata
+        """
+        self.close()
+        if print_reply:
+            return StreamingReplay.to_json(self.path)
+        return json.dumps(dict(self.metadata.__dict__), separators=(',', ':'))
+
+    @staticmethod
+    def to_json(stream_path: str) -> str:
+        """
+        Converts a finished stream into the regular replay JSON
+        """
+        turns = []
+        with open(stream_path) as infile:
+            for line in infile:
+                entry = json.loads(line)
+                if "header" in entry:
+                    retDict = entry["header"]
+                elif "turn" in entry:
+                    turns.append(entry["turn"])
+                elif "footer" in entry:
+                    retDict.update(entry["footer"])
+        retDict['turns'] = turns
+        return json.dumps(retDict, separators=(',', ':'))
+
+
+class NullReplay(Replay):
+    """
+    Replay that records nothing, for games whose replay nobody will watch
+
+    Only the winner and the final score summary are kept, and write_json
+    returns them without writing any file.
+    """
+
+    def __init__(self, game_name: str, map_name: str, map_height: int, map_width: int, red_bot: str,
+        blue_bot: str, initial_metal: int, *initial_maps):
+        self.metadata = ReplayMetadata(game_name, map_name, map_height, map_width, red_bot, blue_bot, initial_metal, None)
+        self.summary = None
+        self.bot_output = None
+
+    def add_explored_tiles(self, tiles: list[tuple[int, int]]) -> None:
+        pass
+
+    def add_terraformed_tiles(self, tiles: list[tuple[int, int]]) -> None:
+        pass
+
+    def add_robot_changes(self, robot: Robot, terminate: bool) -> None:
+        pass
+
+    def addTurn(self, team: str, time_left : float, num_robots : int, turn_number: int, metal: int, timeout = False,
+        red_terraformed: int = 0, blue_terraformed: int = 0, wall_time: float = None, cpu_time: float = None):
+        pass
+
+    def write_json(self, print_reply):
+        retDict = {"game_name": self.metadata.game_name, "winner": self.metadata.winner}
+        retDict.update(self.summary or {})
+        return json.dumps(retDict, separators=(',', ':'))
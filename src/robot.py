@@ -11,9 +11,12 @@ class Robot:
     counter = 1
 
     # Initial
-    def __init__(self, row: int, col: int, team: Team, height: int, width: int, action_cost: int):
-        self._name = f"robot_{self.count()}"
-        self.increment()
+    def __init__(self, row: int, col: int, team: Team, height: int, width: int, action_cost: int, name: str = None):
+        # Robots are named by the game spawning them, the global counter is a fallback
+        if name is None:
+            name = f"robot_{self.count()}"
+            self.increment()
+        self._name = name
         self._type = None
         self._row = row
         self._col = col
@@ -111,8 +114,8 @@ class Robot:
 
 
 class Miner_Robot(Robot):
-    def __init__(self, row: int, col: int, team: Team, height: int, width: int, action_cost: int):
-        Robot.__init__(self, row, col, team, height, width, action_cost)
+    def __init__(self, row: int, col: int, team: Team, height: int, width: int, action_cost: int, name: str = None):
+        Robot.__init__(self, row, col, team, height, width, action_cost, name)
         self._type = RobotType.MINER
         self._action_cost = GameConstants.MINER_ACTION_COST
 
@@ -136,8 +139,8 @@ class Miner_Robot(Robot):
 
 
 class Terraformer_Robot(Robot):
-    def __init__(self, row: int, col: int, team: Team, height: int, width: int, action_cost: int):
-        Robot.__init__(self, row, col, team, height, width, action_cost)
+    def __init__(self, row: int, col: int, team: Team, height: int, width: int, action_cost: int, name: str = None):
+        Robot.__init__(self, row, col, team, height, width, action_cost, name)
         self._type = RobotType.TERRAFORMER
         self._action_cost = GameConstants.TERRAFORMER_ACTION_COST
 
@@ -148,7 +151,7 @@ class Terraformer_Robot(Robot):
         if (map.get_tile_state(self._row, self._col, self._team) != TileState.TERRAFORMABLE):
             raise IllegalActionError(f"Tried to terraform a non-terraformable tile at {self._row, self._col}")
 
-        new_val = map._tiles[self._row][self._col].get_terraform()
+        new_val = map.get_terraform_status(self._row, self._col)
         if self._team == Team.BLUE:
             new_val += 1
         else:
@@ -167,7 +170,7 @@ class Terraformer_Robot(Robot):
         self._battery -= self._action_cost
         map.terraform(self._row, self._col, self._team)
 
-        v = map._tiles[self._row][self._col].get_terraform()
+        v = map.get_terraform_status(self._row, self._col)
         if not (-GameConstants.TERRAFORM_MAX <= v <= GameConstants.TERRAFORM_MAX):
             raise Exception(f"bad {v} at {self._row, self._col}")
 
@@ -175,8 +178,8 @@ class Terraformer_Robot(Robot):
 
 
 class Explorer_Robot(Robot):
-    def __init__(self, row: int, col: int, team: Team, height: int, width: int, action_cost: int):
-        Robot.__init__(self, row, col, team, height, width, action_cost)
+    def __init__(self, row: int, col: int, team: Team, height: int, width: int, action_cost: int, name: str = None):
+        Robot.__init__(self, row, col, team, height, width, action_cost, name)
         self._type = RobotType.EXPLORER
         self._action_cost = GameConstants.EXPLORER_ACTION_COST
         
@@ -184,18 +187,7 @@ class Explorer_Robot(Robot):
     def assert_can_take_action(self, map: Map):
         self.assert_ready_to_act()
 
-        def is_fog(x, y):
-            return map._tiles[x][y].is_fog_of_war(self._team)
-
-        has_fog = False
-        for dx in range(-1, 2):
-            for dy in range(-1, 2):
-                nx, ny = self._row + dx, self._col + dy
-                if 0 <= nx < map.get_height() and 0 <= ny < map.get_width():
-                    if is_fog(nx, ny):
-                        has_fog = True
-
-        if not has_fog:
+        if not map.has_fog_around(self._row, self._col, self._team):
             raise IllegalActionError(f"Tried to explore, but no nearby tiles have fog at {self._row, self._col}")
 
 
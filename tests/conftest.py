@@ -0,0 +1,39 @@
+from src.game import suppress_stdout
+from src.game_state import GameState
+from src.game_constants import GameConstants, Direction, Team, TileState
+from src.replay import NullReplay
+from src.robot import Miner_Robot
+from src.map import Map
+import pytest
+
+
+@pytest.fixture
+def game_state() -> GameState:
+    """
+    Blue's turn on test1 with one blue miner standing on a base tile next to
+    a free tile it can move to
+    """
+    with suppress_stdout():
+        map = Map("maps/test1.awap23m", radius=GameConstants.BASE_VISIBLE_RADIUS)
+    height, width = map.get_height(), map.get_width()
+
+    # Find a base tile with an open neighbor
+    row, col = next((row, col) for row in range(height) for col in range(width)
+        if map.is_terraformed(Team.BLUE, row, col)
+        for move in Direction
+        if map.get_tile_state(row + move.value[0], col + move.value[1], Team.BLUE) == TileState.TERRAFORMABLE)
+
+    robot = Miner_Robot(row, col, Team.BLUE, height, width, GameConstants.MINER_ACTION_COST, "robot_1")
+    robot.reset_move_status()
+    robot.reset_acted_status()
+    info = {
+        "team": Team.BLUE,
+        "red_metal": GameConstants.INIT_METAL,
+        "blue_metal": GameConstants.INIT_METAL,
+        "red_time": GameConstants.TIME_LIMIT,
+        "blue_time": GameConstants.TIME_LIMIT,
+        "turn": 1,
+        "robot_counter": 2,
+    }
+    replay = NullReplay("test", "test1", height, width, "red", "blue", GameConstants.INIT_METAL)
+    return GameState(info, {}, {"robot_1": robot}, replay, map)
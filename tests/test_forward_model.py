@@ -0,0 +1,110 @@
+from src.game_constants import Direction, RobotType, Team, TileState
+from src.game import Game
+from src.replay import NullReplay
+from dataclasses import astuple
+import random
+import pytest
+
+# Explorers are left out, the model keeps explored tiles ILLEGAL on purpose
+TYPES = [RobotType.MINER, RobotType.TERRAFORMER]
+
+
+def legal_actions(model, spawnTiles: list) -> list:
+    """
+    Every action the model allows, in a fixed order
+    """
+    actions = []
+    for name in sorted(model.get_ally_robots()):
+        for move in Direction:
+            if model.can_move_robot(name, move):
+                actions.append(("move_robot", name, move))
+        if model.can_robot_action(name):
+            actions.append(("robot_action", name))
+        for type in TYPES:
+            if model.can_transform_robot(name, type):
+                actions.append(("transform_robot", name, type))
+    for row, col in spawnTiles:
+        for type in TYPES:
+            if model.can_spawn_robot(type, row, col):
+                actions.append(("spawn_robot", type, row, col))
+    return actions
+
+
+def assert_same_state(game_state, model):
+    def robots(robotDict):
+        return {name: astuple(info) for name, info in robotDict.items()}
+    assert robots(model.get_ally_robots()) == robots(game_state.get_ally_robots())
+    assert robots(model.get_enemy_robots()) == robots(game_state.get_enemy_robots())
+    assert model.get_metal() == game_state.get_metal()
+
+    terraformed = {Team.RED: 0, Team.BLUE: 0}
+    for row, tileRow in enumerate(game_state.get_map()):
+        for col, tile in enumerate(tileRow):
+            if tile is None:
+                assert model.get_tile_state(row, col) == TileState.ILLEGAL
+                continue
+            assert model.get_tile_state(row, col) == tile.state
+            assert model.get_terraform(row, col) == tile.terraform
+            assert model.get_mining(row, col) == tile.mining
+            if tile.terraform > 0:
+                terraformed[Team.BLUE] += 1
+            elif tile.terraform < 0:
+                terraformed[Team.RED] += 1
+    for team in Team:
+        assert model.get_terraformed_count(team) == terraformed[team]
+
+
+class RandomPlayer:
+    """
+    Blue player taking random legal actions both in the game and in a model
+    cloned on its first turn, failures are kept since the game thread drops them
+    """
+
+    def __init__(self, seed: int):
+        self.rng = random.Random(seed)
+        self.model = None
+        self.failure = None
+
+    def play_turn(self, game_state):
+        try:
+            self.take_actions(game_state)
+        except AssertionError as e:
+            self.failure = e
+
+    def take_actions(self, game_state):
+        if self.model is None:
+            self.model = game_state.clone()
+        else:
+            self.model.end_turn()
+        assert self.model.get_turn() == game_state.get_turn()
+        assert_same_state(game_state, self.model)
+
+        spawnTiles = [(row, col) for row, tileRow in enumerate(game_state.get_map())
+            for col, tile in enumerate(tileRow) if tile is not None and tile.terraform > 0]
+        for _ in range(10):
+            actions = legal_actions(game_state, spawnTiles)
+            assert legal_actions(self.model, spawnTiles) == actions
+            if not actions:
+                break
+            # Pick the kind first, moves stay legal after moving and would crowd out the rest
+            method = self.rng.choice(sorted({action[0] for action in actions}))
+            _, *args = self.rng.choice([action for action in actions if action[0] == method])
+            modelResult = getattr(self.model, method)(*args)
+            gameResult = getattr(game_state, method)(*args)
+            if method in ("spawn_robot", "transform_robot"):
+                assert astuple(modelResult) == astuple(gameResult)
+            elif method == "move_robot":
+                assert modelResult == gameResult
+            assert_same_state(game_state, self.model)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_clone_follows_game_state(seed):
+    game = Game("clone", "bots/nothing_bot.py", "bots/nothing_bot.py", "maps/test1.awap23m",
+        replay_type=NullReplay, seed=seed)
+    game.blue_player = player = RandomPlayer(seed)
+    for turn in range(1, 21):
+        for team, curr in ((Team.BLUE, game.blue_player), (Team.RED, game.red_player)):
+            game.info.update({"team": team})
+            assert not game.run_turn(turn, curr)
+            assert player.failure is None
@@ -0,0 +1,163 @@
+from src.game import Game
+from src.game_constants import GameConstants
+from src.replay import StreamingReplay
+import shutil
+import pickle
+import sys
+import json
+import pytest
+
+PRINTING_BOT = """
+from src.player import Player
+
+class BotPlayer(Player):
+    def __init__(self, team):
+        self.team = team
+
+    def play_turn(self, game_state):
+        print("turn", game_state.get_info().turn)
+"""
+
+LOOPING_BOT = """
+from src.player import Player
+
+class BotPlayer(Player):
+    def __init__(self, team):
+        self.team = team
+
+    def play_turn(self, game_state):
+        while True:
+            pass
+"""
+
+RANDOM_BOT = """
+from src.player import Player
+from src.game_constants import Direction, RobotType
+import random
+
+class BotPlayer(Player):
+    def __init__(self, team):
+        self.team = team
+
+    def play_turn(self, game_state):
+        ginfo = game_state.get_info()
+        for row, tileRow in enumerate(ginfo.map):
+            for col, tile in enumerate(tileRow):
+                type = random.choice(list(RobotType))
+                if random.random() < 0.2 and game_state.can_spawn_robot(type, row, col):
+                    game_state.spawn_robot(type, row, col)
+        for name in list(game_state.get_ally_robots()):
+            move = random.choice(list(Direction))
+            if game_state.can_move_robot(name, move):
+                game_state.move_robot(name, move)
+            if name in game_state.get_ally_robots() and game_state.can_robot_action(name):
+                game_state.robot_action(name)
+"""
+
+DATACLASS_BOT = """
+from src.player import Player
+from dataclasses import dataclass
+
+@dataclass
+class Plan:
+    target: tuple
+
+class BotPlayer(Player):
+    def __init__(self, team):
+        self.team = team
+        self.plan = Plan((0, 0))
+
+    def play_turn(self, game_state):
+        pass
+"""
+
+# Turn fields that depend on how long the bots took
+TIMING_FIELDS = ("time_left", "wall_time", "cpu_time")
+
+
+@pytest.fixture
+def game_dir(tmp_path, monkeypatch):
+    """
+    Working directory with test1 and nothing_bot, for games whose bots and
+    replays are written by the test
+    """
+    (tmp_path / "maps").mkdir()
+    (tmp_path / "bots").mkdir()
+    shutil.copy("maps/test1.awap23m", tmp_path / "maps")
+    shutil.copy("bots/nothing_bot.py", tmp_path / "bots")
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def test_failed_game_still_finishes_streaming_replay(game_dir, monkeypatch):
+    (game_dir / "bots" / "printing_bot.py").write_text(PRINTING_BOT)
+    game = Game("failed", "bots/printing_bot.py", "bots/nothing_bot.py", "maps/test1.awap23m",
+        replay_type=StreamingReplay, output_to_replay=True, seed=1)
+
+    # The engine breaks partway through turn 3
+    run_turn = game.run_turn
+    def failing_turn(turn, player):
+        if turn == 3:
+            raise RuntimeError("engine bug")
+        return run_turn(turn, player)
+    monkeypatch.setattr(game, "run_turn", failing_turn)
+
+    with pytest.raises(RuntimeError):
+        game.run_game()
+    lines = [json.loads(line) for line in (game_dir / "replays" / "failed.awap23r.jsonl").read_text().splitlines()]
+    assert "footer" in lines[-1]
+    assert lines[-1]["footer"]["bot_output"]["red"] == "turn 1\nturn 2\n"
+
+    # Closing again doesn't add a second footer
+    game.close()
+    assert len((game_dir / "replays" / "failed.awap23r.jsonl").read_text().splitlines()) == len(lines)
+
+
+def test_isolated_bot_that_never_returns_loses_by_timeout(game_dir, monkeypatch):
+    (game_dir / "bots" / "looping_bot.py").write_text(LOOPING_BOT)
+    monkeypatch.setattr(GameConstants, "TIME_LIMIT", 1)
+    game = Game("looping", "bots/looping_bot.py", "bots/nothing_bot.py", "maps/test1.awap23m",
+        isolate=True, print_reply=True, seed=1)
+    worker = game.red_player._process
+
+    replay = json.loads(game.run_game())
+    assert replay["winner"] == "blue"
+    assert replay["turns"][-1]["team"] == "red" and replay["turns"][-1]["time_left"] == -1
+    worker.join(5)
+    assert not worker.is_alive()
+
+
+def test_isolated_game_matches_threaded_game(game_dir, monkeypatch):
+    (game_dir / "bots" / "random_bot.py").write_text(RANDOM_BOT)
+    monkeypatch.setattr(GameConstants, "NUM_TURNS", 30)
+    replays = []
+    for isolate in (False, True):
+        game = Game("random", "bots/nothing_bot.py", "bots/random_bot.py", "maps/test1.awap23m",
+            isolate=isolate, print_reply=True, seed=7)
+        replay = json.loads(game.run_game())
+        for turn in replay["turns"]:
+            for field in TIMING_FIELDS:
+                turn.pop(field)
+        replays.append(replay)
+
+    threaded, isolated = replays
+    assert len(threaded["turns"]) == 2 * 30
+    assert any(turn["robot_changes"] for turn in threaded["turns"])
+    assert isolated["turns"] == threaded["turns"]
+    assert isolated["winner"] == threaded["winner"]
+
+
+def test_threaded_bot_modules_are_registered_per_team(game_dir):
+    (game_dir / "bots" / "dataclass_bot.py").write_text(DATACLASS_BOT)
+    game = Game("modules", "bots/dataclass_bot.py", "bots/dataclass_bot.py", "maps/test1.awap23m", seed=1)
+    blue, red = sys.modules["bots.dataclass_bot_blue"], sys.modules["bots.dataclass_bot_red"]
+    assert blue is not red
+    assert type(game.blue_player) is blue.BotPlayer and type(game.red_player) is red.BotPlayer
+
+    # Pickle finds the bot's classes through sys.modules
+    plan = pickle.loads(pickle.dumps(game.red_player.plan))
+    assert type(plan) is red.Plan and plan == game.red_player.plan
+
+    game.run_game()
+    assert "bots.dataclass_bot_blue" not in sys.modules
+    assert "bots.dataclass_bot_red" not in sys.modules
@@ -0,0 +1,43 @@
+from src.game_constants import Direction, GameConstants
+from src.errors import ExpiredGameInfoError
+from src.map import Map
+import pytest
+
+
+def count_map_builds(monkeypatch) -> list:
+    builds = []
+    realGetMap = Map.get_map
+    monkeypatch.setattr(Map, "get_map", lambda self, team: builds.append(team) or realGetMap(self, team))
+    return builds
+
+
+def test_unread_fields_are_not_built_at_turn_end(game_state, monkeypatch):
+    builds = count_map_builds(monkeypatch)
+
+    info = game_state.get_info()
+    assert info.metal == GameConstants.INIT_METAL
+    game_state._expire_infos()
+
+    assert builds == []
+    for name in ("map", "ally_robots", "enemy_robots"):
+        assert name not in info.__dict__
+        with pytest.raises(ExpiredGameInfoError):
+            getattr(info, name)
+    assert info.metal == GameConstants.INIT_METAL
+
+
+def test_lazy_fields_show_state_when_requested(game_state):
+    info = game_state.get_info()
+    start = game_state.get_ally_robots()["robot_1"]
+    move = next(move for move in Direction if game_state.can_move_robot("robot_1", move))
+    game_state.move_robot("robot_1", move)
+
+    # Read after the move, built before it
+    robot = info.ally_robots["robot_1"]
+    assert (robot.row, robot.col) == (start.row, start.col)
+    assert info.map[start.row][start.col].robot == robot
+    assert info.map[start.row + move.value[0]][start.col + move.value[1]].robot is None
+
+    # A new info shows the move
+    moved = game_state.get_info().ally_robots["robot_1"]
+    assert (moved.row, moved.col) == (start.row + move.value[0], start.col + move.value[1])
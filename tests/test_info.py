@@ -0,0 +1,30 @@
+from src.info import RobotInfo, TileInfo
+import pickle
+import copy
+
+
+def robot_tile(game_state) -> TileInfo:
+    robot = game_state.get_ally_robots()["robot_1"]
+    return game_state.get_map()[robot.row][robot.col]
+
+
+def test_deepcopy_of_tile_is_plain_tile_info(game_state):
+    tile = robot_tile(game_state)
+    tileCopy = copy.deepcopy(tile)
+    assert type(tileCopy) is TileInfo
+    assert type(tileCopy.robot) is RobotInfo
+    assert "_view" not in tileCopy.__dict__
+    assert tileCopy == tile
+
+    # Changing the copy leaves the shared map alone
+    tileCopy.mining = 99
+    assert robot_tile(game_state) is tile
+
+
+def test_copy_and_pickle_of_tile_are_plain(game_state):
+    tile = robot_tile(game_state)
+    for tileCopy in (copy.copy(tile), pickle.loads(pickle.dumps(tile))):
+        assert type(tileCopy) is TileInfo
+        assert tileCopy == tile
+    # A pickled tile holds the tile, not the whole map view
+    assert len(pickle.dumps(tile)) < 1000
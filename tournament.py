@@ -0,0 +1,126 @@
+"""
+This file is responsible for running a round-robin tournament
+between bots on a set of maps, playing the matches in parallel.
+"""
+import argparse
+from src.game import Game, suppress_stdout
+from src.replay import Replay, NullReplay
+from src.map_binary import map_path
+from src.errors import *
+from multiprocessing import Pool
+from itertools import permutations
+from pathlib import Path
+import json
+import os
+import time
+
+
+def play_match(match: tuple[str, str, str, bool, bool]) -> dict:
+    """
+    Plays a single match through Game.run_game and returns its result
+
+    Args:
+        match: (map name, red bot name, blue bot name, save replay, charge CPU time)
+    """
+    map_name, red_bot, blue_bot, save_replay, cpu_time = match
+    game_name = f"{blue_bot}-{red_bot}-{map_name}"
+    result = {"map": map_name, "red_bot": red_bot, "blue_bot": blue_bot, "winner": None, "error": None}
+
+    try:
+        with suppress_stdout():
+            curr = Game(game_name, f"bots/{red_bot}.py", f"bots/{blue_bot}.py", map_path(map_name),
+                silence_blue=True, silence_red=True, replay_type=Replay if save_replay else NullReplay, cpu_time=cpu_time)
+            curr.run_game()
+        result["winner"] = red_bot if curr.replay.metadata.winner == "red" else blue_bot
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    return result
+
+
+def schedule(bots: list[str], maps: list[str], save_replays: bool, cpu_time: bool) -> list[tuple[str, str, str, bool, bool]]:
+    """
+    Every ordered pair of distinct bots plays once on every map,
+    so each pairing is played from both sides
+    """
+    return [(map_name, red_bot, blue_bot, save_replays, cpu_time)
+        for map_name in maps for red_bot, blue_bot in permutations(bots, 2)]
+
+
+def aggregate(bots: list[str], maps: list[str], results: list[dict]) -> dict:
+    """
+    Builds the win matrix (wins[a][b] = games a won against b) and per-map results
+    """
+    wins = {a: {b: 0 for b in bots if b != a} for a in bots}
+    per_map = {map_name: {"matches": [], "wins": {bot: 0 for bot in bots}} for map_name in maps}
+    errors = []
+    for result in results:
+        per_map[result["map"]]["matches"].append(result)
+        if result["error"] is not None:
+            errors.append(result)
+            continue
+        winner = result["winner"]
+        loser = result["blue_bot"] if winner == result["red_bot"] else result["red_bot"]
+        wins[winner][loser] += 1
+        per_map[result["map"]]["wins"][winner] += 1
+
+    totals = {bot: sum(wins[bot].values()) for bot in bots}
+    ranking = sorted(bots, key=lambda bot: totals[bot], reverse=True)
+    return {
+        "bots": bots,
+        "maps": maps,
+        "ranking": [{"bot": bot, "wins": totals[bot]} for bot in ranking],
+        "win_matrix": wins,
+        "per_map": per_map,
+        "errors": errors,
+    }
+
+
+def main():
+    # Parser Arguements
+    parser = argparse.ArgumentParser(description='Run Round-Robin Tournament')
+    parser.add_argument("-b", "--bots", nargs="+", help="bot names (default: every bot in bots/)")
+    parser.add_argument("-m", "--maps", nargs="+", help="map names (default: every map in maps/)")
+    parser.add_argument("-j", "--processes", type=int, default=os.cpu_count(), help="number of worker processes")
+    parser.add_argument("-o", "--output", default="tournament_results.json", help="file to write aggregated results to")
+    parser.add_argument("-sr", "--save_replays", action="store_true", help="write every match replay to replays/")
+    parser.add_argument("-ct", "--cpu_time", action="store_true", help="charge bots for CPU time instead of wall clock time")
+    currNamespace = parser.parse_args()
+
+    # Collect Bots and Maps
+    bots = currNamespace.bots or sorted(p.stem for p in Path("bots").glob("*.py"))
+    maps = currNamespace.maps or sorted(p.stem for p in Path("maps").glob("*.awap23m"))
+    for bot in bots:
+        if not Path(f"bots/{bot}.py").exists():
+            raise InvalidBotFileError(f"Bot file not found: {bot}")
+    for map_name in maps:
+        if not Path(f"maps/{map_name}.awap23m").exists():
+            raise InvalidMapError(f"Map file not found: {map_name}")
+    if len(bots) < 2:
+        print("Please specify at least two bots")
+        exit(1)
+
+    # Play Matches
+    matches = schedule(bots, maps, currNamespace.save_replays, currNamespace.cpu_time)
+    print(f"Playing {len(matches)} matches on {currNamespace.processes} processes")
+    startTime = time.time()
+    results = []
+    with Pool(processes=currNamespace.processes) as pool:
+        for result in pool.imap_unordered(play_match, matches):
+            results.append(result)
+            status = result["error"] or f"winner {result['winner']}"
+            print(f"[{len(results)}/{len(matches)}] {result['red_bot']} (red) vs {result['blue_bot']} (blue) on {result['map']}: {status}")
+    elapsed = time.time() - startTime
+
+    # Save Results
+    summary = aggregate(bots, maps, results)
+    summary["elapsed"] = elapsed
+    with open(currNamespace.output, "w") as outfile:
+        json.dump(summary, outfile, indent=2)
+
+    for place, entry in enumerate(summary["ranking"], 1):
+        print(f"{place}. {entry['bot']} - {entry['wins']} wins")
+    print(f"Played {len(matches)} matches in {elapsed:.1f}s, results saved to {currNamespace.output}")
+
+
+if __name__ == "__main__":
+    main()